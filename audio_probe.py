@@ -0,0 +1,270 @@
+# audio_probe.py - Header-only Audio Probing (duration/format without decoding)
+import os
+import struct
+
+# MPEG audio Layer III tables, indexed by the header's version bits
+MP3_BITRATES_KBPS = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2
+    0: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2.5
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+MIN_VALID_MP3_FRAMES = 3  # consecutive frames required before trusting a sync word
+OGG_TAIL_BYTES = 64 * 1024
+MAX_SCAN_BYTES = 64 * 1024  # how far to look for the first MP3 frame
+XING_MIN_PRESENT_RATIO = 0.9  # below this share of the Xing byte count the file is truncated
+
+
+class AudioProbeError(ValueError):
+    """The file is empty, truncated or not a recognisable audio stream."""
+
+
+def parse_mp3_frame_header(header: bytes):
+    """
+    Decodes a 4-byte MPEG Layer III frame header. Returns a dict with
+    version, sample_rate, bitrate, channels, samples and frame length in
+    bytes, or None if `header` is not a valid Layer III header.
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    bitrate = MP3_BITRATES_KBPS[version][bitrate_index] * 1000
+    coefficient = 144 if version == 3 else 72
+    return {
+        "version": version,
+        "sample_rate": sample_rate,
+        "bitrate": bitrate,
+        "channel_mode": header[3] >> 6,
+        "channels": 1 if header[3] >> 6 == 3 else 2,
+        "samples": 1152 if version == 3 else 576,
+        "length": coefficient * bitrate // sample_rate + ((header[2] >> 1) & 0x01),
+    }
+
+
+def _id3v2_size(data: bytes) -> int:
+    if data[:3] != b'ID3' or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+
+def _mp3_stream_end(f, file_size) -> int:
+    """Offset where MPEG frames end: before a trailing ID3v1 tag, if any."""
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b'TAG':
+            return file_size - 128
+    return file_size
+
+
+def _probe_mp3(f, file_size):
+    head = f.read(10)
+    offset = _id3v2_size(head)
+    f.seek(offset)
+    window = f.read(MAX_SCAN_BYTES)
+
+    # Find the first sync word followed by a run of valid frames
+    first = None
+    for index in range(max(0, len(window) - 3)):
+        header = parse_mp3_frame_header(window[index:index + 4])
+        if not header:
+            continue
+        position, run = index, 0
+        while run < MIN_VALID_MP3_FRAMES:
+            frame = parse_mp3_frame_header(window[position:position + 4])
+            if not frame:
+                break
+            position += frame["length"]
+            run += 1
+        if run >= MIN_VALID_MP3_FRAMES or position >= len(window):
+            first = (offset + index, header)
+            break
+    if first is None:
+        raise AudioProbeError("No valid MP3 frames found")
+
+    start, header = first
+    f.seek(start)
+    first_frame = f.read(header["length"])
+
+    end = _mp3_stream_end(f, file_size)
+
+    # Xing/Info (VBR) header: exact frame count without walking the file
+    for tag in (b'Xing', b'Info'):
+        tag_at = first_frame.find(tag, 4, 64)
+        if tag_at == -1 or len(first_frame) < tag_at + 12 or not first_frame[tag_at + 7] & 0x01:
+            continue
+        flags = first_frame[tag_at + 7]
+        frames = struct.unpack('>I', first_frame[tag_at + 8:tag_at + 12])[0]
+        if flags & 0x02 and len(first_frame) >= tag_at + 16:
+            expected_bytes = struct.unpack('>I', first_frame[tag_at + 12:tag_at + 16])[0]
+        elif tag == b'Info':
+            expected_bytes = frames * header["length"]  # CBR: every frame has the first one's length
+        else:
+            expected_bytes = 0  # VBR without a byte count: nothing to check against
+        # The header describes the complete stream, so an upload cut short would
+        # otherwise pass with its full original duration
+        if end - start < expected_bytes * XING_MIN_PRESENT_RATIO:
+            raise AudioProbeError(f"Truncated MP3 stream ({end - start} of {expected_bytes} bytes)")
+        return header, frames * header["samples"] / header["sample_rate"], "xing"
+
+    # Otherwise walk the frame headers, reading 4 bytes per frame
+    frames = 0
+    samples = 0
+    position = start
+    while position + 4 <= end:
+        f.seek(position)
+        frame = parse_mp3_frame_header(f.read(4))
+        if not frame:
+            break
+        frames += 1
+        samples += frame["samples"]
+        position += frame["length"]
+    if frames == 0:
+        raise AudioProbeError("Truncated MP3 stream")
+    return header, samples / header["sample_rate"], "frames"
+
+
+def _probe_ogg(f, file_size):
+    first_page = f.read(512)
+    segments = first_page[26]
+    packet = first_page[27 + segments:]
+    if packet[:8] == b'OpusHead':
+        codec = "opus"
+        channels = packet[9]
+        pre_skip = struct.unpack('<H', packet[10:12])[0]
+        sample_rate = struct.unpack('<I', packet[12:16])[0] or 48000
+        granule_rate = 48000  # Opus granule positions are always 48 kHz
+    elif packet[:7] == b'\x01vorbis':
+        codec = "vorbis"
+        channels = packet[11]
+        sample_rate = struct.unpack('<I', packet[12:16])[0]
+        pre_skip = 0
+        granule_rate = sample_rate
+    else:
+        raise AudioProbeError("Unsupported OGG codec")
+
+    f.seek(max(0, file_size - OGG_TAIL_BYTES))
+    tail = f.read()
+    last_page = tail.rfind(b'OggS')
+    if last_page == -1 or last_page + 14 > len(tail):
+        raise AudioProbeError("Truncated OGG stream")
+    granule = struct.unpack('<q', tail[last_page + 6:last_page + 14])[0]
+    if granule < 0:
+        raise AudioProbeError("OGG stream has no final granule position")
+    duration = max(0, granule - pre_skip) / granule_rate
+    return {"codec": codec, "sample_rate": sample_rate, "channels": channels}, duration
+
+
+def _probe_wav(f):
+    f.seek(12)
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise AudioProbeError("WAV file has no data chunk")
+        chunk_id, chunk_size = chunk[:4], struct.unpack('<I', chunk[4:8])[0]
+        if chunk_id == b'fmt ':
+            body = f.read(chunk_size + (chunk_size & 1))
+            audio_format, channels, sample_rate, byte_rate = struct.unpack('<HHII', body[:12])
+            fmt = {"codec": "pcm" if audio_format == 1 else f"wav_{audio_format}",
+                   "sample_rate": sample_rate, "channels": channels, "byte_rate": byte_rate}
+        elif chunk_id == b'data':
+            if not fmt or not fmt["byte_rate"]:
+                raise AudioProbeError("WAV data chunk before a valid fmt chunk")
+            return fmt, chunk_size / fmt["byte_rate"]
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def _probe_flac(f):
+    f.seek(4)
+    block_header = f.read(4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        raise AudioProbeError("FLAC stream has no STREAMINFO block")
+    info = f.read(34)
+    if len(info) < 18:
+        raise AudioProbeError("Truncated FLAC STREAMINFO")
+    packed = int.from_bytes(info[10:18], 'big')
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x07) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise AudioProbeError("Invalid FLAC sample rate")
+    # A total of 0 means the encoder did not know the length (e.g. streamed)
+    duration = total_samples / sample_rate if total_samples else None
+    return {"codec": "flac", "sample_rate": sample_rate, "channels": channels}, duration
+
+
+def probe_audio(filepath: str) -> dict:
+    """
+    Reads container/frame headers only and returns format, codec, duration
+    (seconds, None if the container is not understood), sample rate and
+    channels. Raises AudioProbeError for empty or corrupt files.
+    """
+    file_size = os.path.getsize(filepath)
+    if file_size == 0:
+        raise AudioProbeError("Audio file is empty")
+
+    with open(filepath, 'rb') as f:
+        try:
+            return _probe_file(f, file_size)
+        except (IndexError, struct.error) as e:
+            raise AudioProbeError(f"Corrupt audio header ({e})")
+
+
+def _probe_file(f, file_size: int) -> dict:
+    magic = f.read(12)
+    f.seek(0)
+    if magic[:4] == b'OggS':
+        info, duration = _probe_ogg(f, file_size)
+        info["format"] = "ogg"
+    elif magic[:4] == b'RIFF' and magic[8:12] == b'WAVE':
+        info, duration = _probe_wav(f)
+        info.pop("byte_rate", None)
+        info["format"] = "wav"
+    elif magic[:4] == b'fLaC':
+        info, duration = _probe_flac(f)
+        info["format"] = "flac"
+    elif magic[4:8] == b'ftyp':
+        # MP4/M4A: identified but not parsed, left to ffmpeg
+        return {"format": "mp4", "codec": None, "duration": None,
+                "sample_rate": None, "channels": None, "size": file_size}
+    else:
+        looks_like_mp3 = magic[:3] == b'ID3' or parse_mp3_frame_header(magic[:4]) is not None
+        try:
+            header, duration, method = _probe_mp3(f, file_size)
+        except AudioProbeError:
+            if looks_like_mp3:
+                raise
+            return {"format": "unknown", "codec": None, "duration": None,
+                    "sample_rate": None, "channels": None, "size": file_size}
+        info = {"format": "mp3", "codec": "mp3", "sample_rate": header["sample_rate"],
+                "channels": header["channels"], "bitrate": header["bitrate"], "duration_method": method}
+
+    info["duration"] = round(duration, 3) if duration is not None else None
+    info["size"] = file_size
+    return info
+
+
+def validate_audio(filepath: str, max_duration: float = None, min_duration: float = 0.3) -> dict:
+    """
+    Probes `filepath` and raises AudioProbeError if it is empty, corrupt,
+    shorter than `min_duration` or longer than `max_duration` seconds.
+    Returns the probe result.
+    """
+    info = probe_audio(filepath)
+    duration = info["duration"]
+    if duration is not None:
+        if duration < min_duration:
+            raise AudioProbeError(f"Audio is too short ({duration:.1f}s)")
+        if max_duration and duration > max_duration:
+            raise AudioProbeError(f"Audio is too long ({duration:.0f}s, limit {max_duration:.0f}s)")
+    return info
@@ -0,0 +1,200 @@
+# buffer_pool.py - Reusable Audio/Mel Buffers and Per-Request Allocation Accounting
+import sys
+import os
+import gc
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Audio buffers are sized in whole classes of this many seconds, so notes of
+# similar length land in the same buffer instead of each growing a new one.
+SIZE_CLASS_SECONDS = 5
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def size_class(size: int, step: int) -> int:
+    """`size` rounded up to a whole number of `step`s (at least one)."""
+    return max(1, -(-size // step)) * step
+
+
+class BufferPool:
+    """
+    Named, size-classed NumPy and torch buffers owned by one resident
+    transcriber. Not thread-safe: give each worker thread its own pool.
+    """
+
+    def __init__(self, step_samples=SIZE_CLASS_SECONDS * SAMPLE_RATE):
+        self.step_samples = step_samples
+        self._arrays = {}
+        self._tensors = {}
+        self.hits = 0
+        self.allocations = 0
+
+    def array(self, name: str, size: int, dtype=np.float32, keep: bool = False, step: int = None) -> np.ndarray:
+        """
+        A length-`size` view of the pooled 1-D array `name`. The backing array
+        is only reallocated (to the next multiple of `step` elements, default
+        one audio size class) when it is too small; with `keep` the old
+        contents are copied into the new one.
+        """
+        current = self._arrays.get(name)
+        if current is not None and current.dtype == dtype and len(current) >= size:
+            self.hits += 1
+            return current[:size]
+
+        buffer = np.empty(size_class(size, step or self.step_samples), dtype=dtype)
+        if keep and current is not None:
+            buffer[:len(current)] = current
+        self._arrays[name] = buffer
+        self.allocations += 1
+        return buffer[:size]
+
+    def tensor(self, name: str, shape: tuple, dtype=None, device=None):
+        """The pooled torch tensor `name`, reallocated only when shape/dtype/device change."""
+        import torch
+
+        dtype = dtype or torch.float32
+        current = self._tensors.get(name)
+        if (current is not None and tuple(current.shape) == tuple(shape) and current.dtype == dtype
+                and (device is None or current.device == torch.device(device))):
+            self.hits += 1
+            return current
+
+        tensor = torch.empty(shape, dtype=dtype, device=device)
+        self._tensors[name] = tensor
+        self.allocations += 1
+        return tensor
+
+    def constant(self, name: str, factory):
+        """Tensor built once by `factory()` and kept for the pool's lifetime."""
+        if name not in self._tensors:
+            self._tensors[name] = factory()
+            self.allocations += 1
+        return self._tensors[name]
+
+    def stats(self) -> dict:
+        held = sum(buffer.nbytes for buffer in self._arrays.values())
+        held += sum(tensor.numel() * tensor.element_size() for tensor in self._tensors.values())
+        return {"hits": self.hits, "allocations": self.allocations, "held_mb": round(held / (1024 * 1024), 2)}
+
+
+def load_audio_into(filepath: str, pool: BufferPool, expected_seconds: float = None,
+                    sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    whisper.load_audio() without per-request arrays: ffmpeg's PCM is read
+    straight into the pooled byte buffer and converted in place into the
+    pooled float32 buffer. Returns a view that is only valid until the next
+    call with the same pool.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", filepath,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Start from the probed duration (plus a second of slack) to avoid regrowing
+    capacity = int(((expected_seconds or SIZE_CLASS_SECONDS) + 1) * sample_rate) * 2
+    pcm_step = pool.step_samples * 2  # bytes per size class of 16-bit samples
+    raw = pool.array("pcm", capacity, np.uint8, step=pcm_step)
+    received = 0
+    while True:
+        if received == len(raw):
+            raw = pool.array("pcm", len(raw) + pcm_step, np.uint8, keep=True, step=pcm_step)
+        count = process.stdout.readinto(memoryview(raw)[received:])
+        if not count:
+            break
+        received += count
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"Failed to load audio: {stderr.decode(errors='replace')}")
+
+    pcm = raw[:received - received % 2].view(np.int16)
+    audio = pool.array("audio", len(pcm), np.float32)
+    np.multiply(pcm, 1.0 / 32768.0, out=audio, casting='unsafe')
+    return audio
+
+
+def log_mel_into(audio: np.ndarray, pool: BufferPool, n_mels: int, n_samples: int, device=None):
+    """
+    whisper.log_mel_spectrogram(pad_or_trim(audio)) written into pooled
+    buffers: the padded window and the (n_mels, frames) output are reused,
+    leaving only torch.stft's internal working set per call.
+    """
+    import torch
+    import whisper
+
+    padded = pool.array("padded", n_samples, np.float32)
+    length = min(len(audio), n_samples)
+    padded[:length] = audio[:length]
+    padded[length:] = 0.0
+
+    samples = torch.from_numpy(padded)
+    window = pool.constant("hann_window", lambda: torch.hann_window(whisper.audio.N_FFT))
+    stft = torch.stft(samples, whisper.audio.N_FFT, whisper.audio.HOP_LENGTH, window=window, return_complex=True)
+    magnitudes = stft[..., :-1].abs().square_()
+
+    filters = whisper.audio.mel_filters(samples.device, n_mels)
+    mel = pool.tensor("mel", (n_mels, magnitudes.shape[-1]))
+    torch.matmul(filters, magnitudes, out=mel)
+    mel.clamp_(min=1e-10).log10_()
+    mel.clamp_(min=mel.max().item() - 8.0)
+    mel.add_(4.0).div_(4.0)
+    return mel if device is None else mel.to(device)
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None without `resource`."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+class AllocationMeter:
+    """
+    Context manager measuring one request: Python heap blocks allocated and
+    still held, GC collections, pool hits/allocations, and the change in
+    resident and peak-resident memory of the process.
+    """
+
+    def __init__(self, pool: BufferPool = None):
+        self.pool = pool
+        self.report = {}
+
+    def __enter__(self):
+        self._blocks = sys.getallocatedblocks()
+        self._collections = sum(stats["collections"] for stats in gc.get_stats())
+        self._rss = current_rss_bytes()
+        self._peak = peak_rss_bytes()
+        self._pool = (self.pool.hits, self.pool.allocations) if self.pool else None
+        return self
+
+    def __exit__(self, *exc):
+        rss = current_rss_bytes()
+        mb = 1024 * 1024
+        self.report = {
+            "python_blocks_delta": sys.getallocatedblocks() - self._blocks,
+            "gc_collections": sum(stats["collections"] for stats in gc.get_stats()) - self._collections,
+            "rss_delta_mb": round((rss - self._rss) / mb, 2) if rss is not None and self._rss is not None else None,
+            "peak_rss_delta_mb": round((peak_rss_bytes() - self._peak) / mb, 2) if self._peak is not None else None,
+        }
+        if self.pool:
+            self.report["pool_hits"] = self.pool.hits - self._pool[0]
+            self.report["pool_allocations"] = self.pool.allocations - self._pool[1]
+            self.report["pool_held_mb"] = self.pool.stats()["held_mb"]
+        return False
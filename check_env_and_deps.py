@@ -1,6 +1,11 @@
+import os
 import sys
+import json
+import time
 import shutil
-import importlib
+import argparse
+import platform
+import importlib.util
 import subprocess
 
 REQUIRED_PACKAGES = [
@@ -13,6 +18,22 @@ REQUIRED_PACKAGES = [
     'whisper',
 ]
 
+# Distribution names whose import name differs
+IMPORT_NAMES = {
+    'SpeechRecognition': 'speech_recognition',
+}
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_AUDIO = os.path.join(BASE_DIR, 'test.mp3')
+PROFILE_FILE = os.environ.get("TRANSCRIBE_PROFILE_FILE", os.path.join(BASE_DIR, 'data', 'runtime_profile.json'))
+SIMD_FLAGS = ['sse4_2', 'avx', 'avx2', 'fma', 'avx512f', 'avx512_vnni', 'amx_tile', 'neon', 'asimd', 'sve']
+
+# Typical voice note the recommendations are sized for
+TYPICAL_NOTE_SECONDS = 15.0
+
+def import_name(pkg):
+    return IMPORT_NAMES.get(pkg, pkg.replace('-', '_'))
+
 def check_python():
     print(f"Python version: {sys.version}")
     if sys.version_info < (3, 7):
@@ -30,17 +51,163 @@ def check_ffmpeg():
         return False
 
 def check_packages():
+    """Presence check via import specs - nothing is actually imported."""
     all_ok = True
     for pkg in REQUIRED_PACKAGES:
-        try:
-            importlib.import_module(pkg.replace('-', '_'))
+        if importlib.util.find_spec(import_name(pkg)) is not None:
             print(f"✅ {pkg} installed")
-        except ImportError:
+        else:
             print(f"❌ {pkg} NOT installed. Run: pip install {pkg}")
             all_ok = False
     return all_ok
 
+def time_imports():
+    """Real import cost of each installed package, each in a fresh interpreter."""
+    timings = {}
+    for pkg in REQUIRED_PACKAGES:
+        name = import_name(pkg)
+        if importlib.util.find_spec(name) is None:
+            continue
+        code = f"import time; t = time.perf_counter(); import {name}; print(time.perf_counter() - t)"
+        try:
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=300)
+            timings[pkg] = round(float(result.stdout.strip().splitlines()[-1]), 3)
+            print(f"⏱️ import {name}: {timings[pkg]:.2f}s")
+        except (subprocess.SubprocessError, ValueError, IndexError):
+            timings[pkg] = None
+            print(f"⚠️ import {name} failed")
+    return timings
+
+def detect_cpu():
+    """Logical/physical/usable cores and the SIMD extensions the CPU reports."""
+    info = {
+        "logical_cores": os.cpu_count() or 1,
+        "physical_cores": None,
+        "usable_cores": len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1),
+        "machine": platform.machine(),
+        "simd": [],
+    }
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpuinfo = f.read()
+        flags = set()
+        cores = set()
+        physical_id = None
+        for line in cpuinfo.splitlines():
+            key, _, value = line.partition(':')
+            key = key.strip()
+            if key in ('flags', 'Features'):
+                flags.update(value.split())
+            elif key == 'physical id':
+                physical_id = value.strip()
+            elif key == 'core id':
+                cores.add((physical_id, value.strip()))
+        info["simd"] = [flag for flag in SIMD_FLAGS if flag in flags]
+        info["physical_cores"] = len(cores) or None
+    except OSError:
+        pass
+
+    if importlib.util.find_spec('torch') is not None:
+        try:
+            import torch
+            info["torch_cpu_capability"] = torch.backends.cpu.get_cpu_capability()
+        except Exception:
+            pass
+    return info
+
+def calibrate_decode(thread_counts, audio_path=CALIBRATION_AUDIO, model_size='tiny'):
+    """
+    Decodes the bundled test clip with `model_size` at each thread count and
+    returns seconds and realtime factor per setting.
+    """
+    import torch
+    import whisper
+
+    audio = whisper.load_audio(audio_path)
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+    model = whisper.load_model(model_size)
+    options = {"fp16": False, "temperature": 0.0, "beam_size": 5, "best_of": 2, "patience": 1.0}
+
+    model.transcribe(audio, **options)  # warm-up: first call pays one-off allocation costs
+    runs = []
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        start = time.perf_counter()
+        model.transcribe(audio, **options)
+        seconds = time.perf_counter() - start
+        runs.append({"threads": threads, "seconds": round(seconds, 3),
+                     "realtime_factor": round(seconds / duration, 4)})
+        print(f"🧪 {model_size} @ {threads} threads: {seconds:.2f}s ({seconds / duration:.2f}x realtime)")
+    return {"model": model_size, "audio_seconds": round(duration, 2), "runs": runs}
+
+def recommend_settings(cpu, calibration):
+    """Model size, torch threads per process and worker processes for this host."""
+    from transcribe import (MODEL_PREFERENCE, DEFAULT_MAX_MODEL, MODEL_MEMORY_MB,
+                            DEFAULT_REALTIME_FACTORS, DEFAULT_LOAD_SECONDS, DEFAULT_LATENCY_TARGET_SECONDS,
+                            MEMORY_HEADROOM_MB, get_host_resources)
+
+    runs = calibration["runs"]
+    fastest = min(run["seconds"] for run in runs)
+    # Fewest threads within 10% of the best time leaves cores for other workers
+    best = min((run for run in runs if run["seconds"] <= fastest * 1.1), key=lambda run: run["threads"])
+    threads = best["threads"]
+
+    available_mb = get_host_resources()["available_memory_mb"]
+    measured_scale = best["realtime_factor"] / DEFAULT_REALTIME_FACTORS[calibration["model"]]
+    model_size = MODEL_PREFERENCE[-1]
+    # The result becomes transcribe.py's max_model, so never recommend above its ceiling
+    for candidate in MODEL_PREFERENCE[MODEL_PREFERENCE.index(DEFAULT_MAX_MODEL):]:
+        predicted = DEFAULT_LOAD_SECONDS[candidate] + \
+            TYPICAL_NOTE_SECONDS * DEFAULT_REALTIME_FACTORS[candidate] * measured_scale
+        fits_memory = available_mb is None or MODEL_MEMORY_MB[candidate] + MEMORY_HEADROOM_MB <= available_mb
+        if fits_memory and predicted <= DEFAULT_LATENCY_TARGET_SECONDS / 2:
+            model_size = candidate
+            break
+
+    workers = max(1, cpu["usable_cores"] // threads)
+    if available_mb is not None:
+        workers = max(1, min(workers, (available_mb - MEMORY_HEADROOM_MB) // MODEL_MEMORY_MB[model_size]))
+
+    return {"model_size": model_size, "threads": threads, "workers": int(workers)}
+
+def run_profile(output_path=PROFILE_FILE):
+    """Profiles the host and writes the runtime profile read by transcribe.py."""
+    print("--- CAPABILITY PROFILE ---")
+    cpu = detect_cpu()
+    print(f"CPU: {cpu['usable_cores']} usable / {cpu['logical_cores']} logical cores, "
+          f"SIMD: {', '.join(cpu['simd']) or 'none detected'}")
+    profile = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpu": cpu,
+        "import_seconds": time_imports(),
+    }
+
+    if not check_ffmpeg() or importlib.util.find_spec('whisper') is None or not os.path.exists(CALIBRATION_AUDIO):
+        print("❌ Calibration needs ffmpeg, whisper and test.mp3 - profile written without recommendations.")
+    else:
+        thread_counts = sorted({1, 2, 4, 8, cpu["usable_cores"]} & set(range(1, cpu["usable_cores"] + 1)))
+        try:
+            profile["calibration"] = calibrate_decode(thread_counts)
+            profile["recommended"] = recommend_settings(cpu, profile["calibration"])
+            print(f"✅ Recommended: model={profile['recommended']['model_size']}, "
+                  f"threads={profile['recommended']['threads']}, workers={profile['recommended']['workers']}")
+        except Exception as e:
+            print(f"❌ Calibration failed: {e}")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+    print(f"📄 Profile written to {output_path}")
+    return profile
+
 def main():
+    parser = argparse.ArgumentParser(description="Environment check and runtime capability profiler")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time imports, detect CPU features, calibrate decoding and write a runtime profile")
+    parser.add_argument("--output", default=PROFILE_FILE, help="Where to write the runtime profile")
+    args = parser.parse_args()
+
     print("--- ENVIRONMENT CHECK ---")
     py_ok = check_python()
     ff_ok = check_ffmpeg()
@@ -50,5 +217,9 @@ def main():
     else:
         print("\n❌ Some dependencies are missing. Please fix the above issues.")
 
+    if args.profile:
+        print()
+        run_profile(args.output)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,185 @@
+# decode_sweep.py - Decoding Parameter Sweep with Latency/Accuracy Pareto Report
+import sys
+import os
+import re
+import csv
+import json
+import time
+import glob
+import argparse
+import itertools
+
+from transcribe import EnhancedEducationalTranscriber, whisper
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.opus', '.m4a', '.flac')
+
+# Default grid around the hand-picked settings in build_decode_options()
+DEFAULT_GRID = {
+    "model": ["tiny", "base", "small"],
+    "beam_size": [None, 2, 5],
+    "best_of": [2],  # only used by sampling fallbacks; inert at temperature 0
+    "patience": [1.0],
+    "compression_ratio_threshold": [2.4],
+    "logprob_threshold": [-1.0],
+    "no_speech_threshold": [0.6],
+    "prompt_terms": [0, 10, 20],
+}
+
+
+def load_corpus(corpus_dir):
+    """
+    Labelled corpus as [(audio_path, reference_text)]. Reads manifest.jsonl
+    ({"audio": ..., "text": ...} per line, paths relative to the corpus) if
+    present, otherwise pairs each audio file with a same-named .txt file.
+    References should be written the way enhanced_post_process() outputs text.
+    """
+    manifest = os.path.join(corpus_dir, 'manifest.jsonl')
+    corpus = []
+    if os.path.exists(manifest):
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    corpus.append((os.path.join(corpus_dir, item["audio"]), item["text"]))
+        return corpus
+
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*'))):
+        stem, extension = os.path.splitext(path)
+        if extension.lower() in AUDIO_EXTENSIONS and os.path.exists(stem + '.txt'):
+            with open(stem + '.txt', 'r', encoding='utf-8') as f:
+                corpus.append((path, f.read().strip()))
+    return corpus
+
+
+def normalize_for_scoring(text):
+    text = re.sub(r'[^\w\s]', ' ', text.lower())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def edit_distance(reference, hypothesis):
+    """Levenshtein distance between two token sequences."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_token in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_token in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_token != hyp_token)))
+        previous = current
+    return previous[-1]
+
+
+def error_rates(reference, hypothesis):
+    """(word error rate, character error rate) after normalization."""
+    reference = normalize_for_scoring(reference)
+    hypothesis = normalize_for_scoring(hypothesis)
+    ref_words = reference.split()
+    wer = edit_distance(ref_words, hypothesis.split()) / max(1, len(ref_words))
+    cer = edit_distance(list(reference), list(hypothesis)) / max(1, len(reference))
+    return wer, cer
+
+
+def expand_grid(grid):
+    """Every combination of the grid, grouped so each model is loaded once."""
+    keys = [key for key in grid if key != "model"]
+    for model_size in grid["model"]:
+        for values in itertools.product(*(grid[key] for key in keys)):
+            yield model_size, dict(zip(keys, values))
+
+
+def pareto_frontier(rows, cost_key="wall_seconds_per_file", error_key="wer"):
+    """Rows not dominated on (cost, error); ties broken by character error rate."""
+    frontier = []
+    for row in rows:
+        dominated = any(
+            other is not row
+            and other[cost_key] <= row[cost_key] and other[error_key] <= row[error_key]
+            and (other[cost_key] < row[cost_key] or other[error_key] < row[error_key]
+                 or other["cer"] < row["cer"])
+            for other in rows
+        )
+        if not dominated:
+            frontier.append(row)
+    return sorted(frontier, key=lambda row: row[cost_key])
+
+
+def run_sweep(corpus, grid):
+    rows = []
+    audio_cache = {}
+    for model_size, group in itertools.groupby(expand_grid(grid), key=lambda item: item[0]):
+        transcriber = EnhancedEducationalTranscriber(model_size=model_size)
+        # Untimed warm-up so one-off allocations don't land on the first setting
+        first_audio = corpus[0][0]
+        audio_cache.setdefault(first_audio, whisper.load_audio(first_audio))
+        transcriber.model.transcribe(audio_cache[first_audio], **transcriber.build_decode_options())
+        for _, params in group:
+            options = transcriber.build_decode_options(
+                prompt_terms=params["prompt_terms"],
+                **{key: value for key, value in params.items() if key != "prompt_terms"}
+            )
+            if options["beam_size"] is None:
+                options["patience"] = None  # patience only applies to beam search
+            wall_total = cpu_total = wer_total = cer_total = 0.0
+            for audio_path, reference in corpus:
+                if audio_path not in audio_cache:
+                    audio_cache[audio_path] = whisper.load_audio(audio_path)
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                result = transcriber.model.transcribe(audio_cache[audio_path], **options)
+                wall_total += time.perf_counter() - wall_start
+                cpu_total += time.process_time() - cpu_start
+
+                raw_text = result["text"].strip()
+                text = transcriber.enhanced_post_process(raw_text, result.get("language", "unknown"))["text"] \
+                    if raw_text else ""
+                wer, cer = error_rates(reference, text)
+                wer_total += wer
+                cer_total += cer
+
+            count = len(corpus)
+            row = {"model": model_size, **params,
+                   "wall_seconds_per_file": round(wall_total / count, 3),
+                   "cpu_seconds_per_file": round(cpu_total / count, 3),
+                   "wer": round(wer_total / count, 4),
+                   "cer": round(cer_total / count, 4)}
+            rows.append(row)
+            print(f"📐 {row}", file=sys.stderr)
+    return rows
+
+
+def write_reports(rows, frontier, output_prefix, grid, corpus_size):
+    frontier_ids = {id(row) for row in frontier}
+    with open(output_prefix + '.json', 'w', encoding='utf-8') as f:
+        json.dump({"corpus_files": corpus_size, "grid": grid, "pareto_frontier": frontier, "results": rows},
+                  f, indent=2, ensure_ascii=False)
+    with open(output_prefix + '.csv', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) + ["pareto"])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "pareto": id(row) in frontier_ids})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep Whisper decoding settings over a labelled corpus")
+    parser.add_argument("corpus", help="Directory of audio files with .txt references (or manifest.jsonl)")
+    parser.add_argument("--grid", type=json.loads, default=None,
+                        help="JSON object overriding grid axes, e.g. '{\"model\": [\"tiny\"], \"beam_size\": [null, 5]}'")
+    parser.add_argument("--output-prefix", default="decode_sweep")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID, **(args.grid or {}))
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"❌ No labelled audio found in {args.corpus}", file=sys.stderr)
+        sys.exit(1)
+
+    combinations = sum(1 for _ in expand_grid(grid))
+    print(f"🔬 Sweeping {combinations} settings over {len(corpus)} files...", file=sys.stderr)
+    rows = run_sweep(corpus, grid)
+    frontier = pareto_frontier(rows)
+    write_reports(rows, frontier, args.output_prefix, grid, len(corpus))
+
+    print(f"✅ Pareto frontier ({len(frontier)} settings) written to "
+          f"{args.output_prefix}.json and {args.output_prefix}.csv", file=sys.stderr)
+    for row in frontier:
+        print(f"   {row['model']:<6} beam={row['beam_size']} best_of={row['best_of']} "
+              f"prompt={row['prompt_terms']}: {row['wall_seconds_per_file']}s/file, WER {row['wer']:.3f}",
+              file=sys.stderr)
@@ -0,0 +1,273 @@
+# learner_analytics.py - Streaming Analytics over Learner History (data/user_data.json)
+import sys
+import os
+import json
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from transcribe import classify_question_intent
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_FILE = os.path.join(BASE_DIR, 'data', 'user_data.json')
+DEFAULT_STATE_FILE = os.path.join(BASE_DIR, 'data', 'analytics_state.json')
+
+READ_CHUNK_SIZE = 64 * 1024
+BATCH_ROWS = 50000  # history rows per columnar batch
+DEVANAGARI_PATTERN = r'[ऀ-ॿ]'
+
+HISTORY_COLUMNS = ['user_id', 'query', 'type', 'correct', 'language']
+COUNT_KEYS = ['topic_views', 'topic_attempts', 'topic_correct', 'intent', 'language', 'script', 'entry_type']
+
+
+def iter_user_records(filepath, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields (user_id, user_record) pairs from the top-level JSON object in
+    `filepath`, reading it in chunks so only one learner is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        eof = False
+
+        def fill():
+            nonlocal buffer, position, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        def next_char():
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n':
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if eof:
+                    return ''
+                fill()
+
+        def decode_value():
+            nonlocal position
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    position = end
+                    return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+
+        if next_char() != '{':
+            raise ValueError(f"{filepath} does not contain a JSON object of learners")
+        position += 1
+
+        while True:
+            char = next_char()
+            if char == ',':
+                position += 1
+                continue
+            if char == '}' or char == '':
+                return
+            user_id = decode_value()
+            if next_char() != ':':
+                raise ValueError(f"Malformed learner entry for {user_id!r}")
+            position += 1
+            next_char()
+            yield user_id, decode_value()
+
+
+def load_state(state_file):
+    """Processed-history offsets per learner plus the running aggregate counts."""
+    state = {}
+    if state_file:
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            state = {}
+    state.setdefault("users", {})
+    state.setdefault("counts", {})
+    for key in COUNT_KEYS:
+        state["counts"].setdefault(key, {})
+    return state
+
+
+def save_state(state_file, state):
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def add_counts(target: dict, series: pd.Series):
+    """Adds a value_counts/groupby Series into a plain {label: count} dict."""
+    for label, count in series.items():
+        target[str(label)] = target.get(str(label), 0) + int(count)
+
+
+def aggregate_history_batch(columns: dict, counts: dict):
+    """Vectorized aggregation of one columnar batch of new history rows."""
+    history = pd.DataFrame(columns, columns=HISTORY_COLUMNS)
+    if history.empty:
+        return
+    history['query'] = history['query'].fillna('').astype(str)
+    history['type'] = history['type'].fillna('question')
+    history['topic'] = history['query'].str.strip().str.lower()
+
+    add_counts(counts['entry_type'], history['type'].value_counts())
+    add_counts(counts['language'], history['language'].fillna('unknown').value_counts())
+
+    is_devanagari = history['query'].str.contains(DEVANAGARI_PATTERN, regex=True)
+    add_counts(counts['script'], is_devanagari.map({True: 'devanagari', False: 'latin'}).value_counts())
+
+    has_topic = history['topic'] != ''
+    learning = history[has_topic & (history['type'] == 'topic_learning')]
+    add_counts(counts['topic_views'], learning['topic'].value_counts())
+
+    quiz = history[has_topic & (history['type'] == 'quiz_answer') & history['correct'].notna()]
+    if not quiz.empty:
+        add_counts(counts['topic_attempts'], quiz.groupby('topic').size())
+        add_counts(counts['topic_correct'], quiz.groupby('topic')['correct'].sum())
+
+    # Classify each distinct query once, then scatter labels back by code
+    questions = history[history['type'] != 'quiz_answer']['query']
+    codes, uniques = pd.factorize(questions)
+    if len(uniques):
+        labels = np.array([classify_question_intent(text) for text in uniques])
+        label_values, label_codes = np.unique(labels, return_inverse=True)
+        per_label = np.bincount(label_codes[codes], minlength=len(label_values))
+        add_counts(counts['intent'], pd.Series(per_label, index=label_values))
+
+
+def run_analytics(data_file, state_file=None, full=False):
+    """
+    Streams learners from `data_file`, aggregates history entries not seen in
+    a previous run (all of them with `full`) and returns the report.
+    """
+    state = load_state(None if full else state_file)
+    processed = state["users"]
+    counts = state["counts"]
+
+    columns = {name: [] for name in HISTORY_COLUMNS}
+    user_columns = {'user_id': [], 'preferred_language': [], 'last_voice_language': [],
+                    'quiz_correct': [], 'quiz_total': [], 'topics_studied': [], 'history_length': []}
+    new_rows = 0
+    reset_users = []
+
+    for user_id, record in iter_user_records(data_file):
+        history = record.get('learningHistory') or []
+        score = record.get('score') or {}
+        user_columns['user_id'].append(user_id)
+        user_columns['preferred_language'].append(record.get('preferredLanguage') or 'unknown')
+        user_columns['last_voice_language'].append(record.get('lastVoiceLanguage') or 'unknown')
+        user_columns['quiz_correct'].append(score.get('correct', 0))
+        user_columns['quiz_total'].append(score.get('total', 0))
+        user_columns['topics_studied'].append(len(record.get('topicsStudied') or []))
+        user_columns['history_length'].append(len(history))
+
+        start = processed.get(user_id, 0)
+        if start > len(history):
+            # History was truncated or reset: counts from the old entries stay
+            reset_users.append(user_id)
+            start = 0
+        fallback_language = record.get('preferredLanguage')
+        for entry in history[start:]:
+            columns['user_id'].append(user_id)
+            columns['query'].append(entry.get('query'))
+            columns['type'].append(entry.get('type'))
+            correct = entry.get('correct')
+            columns['correct'].append(float(correct) if isinstance(correct, bool) else np.nan)
+            columns['language'].append(entry.get('language') or fallback_language)
+        new_rows += len(history) - start
+        processed[user_id] = len(history)
+
+        if len(columns['query']) >= BATCH_ROWS:
+            aggregate_history_batch(columns, counts)
+            columns = {name: [] for name in HISTORY_COLUMNS}
+
+    aggregate_history_batch(columns, counts)
+
+    if reset_users:
+        print(f"⚠️ {len(reset_users)} learners have shorter history than last run; "
+              f"use --full for exact totals", file=sys.stderr)
+
+    if state_file:
+        state["last_run"] = datetime.now(timezone.utc).isoformat()
+        save_state(state_file, state)
+
+    return build_report(counts, pd.DataFrame(user_columns), new_rows)
+
+
+def build_report(counts: dict, users: pd.DataFrame, new_rows: int) -> dict:
+    """Turns the accumulated counts and the per-learner frame into the report."""
+    topics = pd.DataFrame({
+        'views': pd.Series(counts['topic_views'], dtype='float64'),
+        'attempts': pd.Series(counts['topic_attempts'], dtype='float64'),
+        'correct': pd.Series(counts['topic_correct'], dtype='float64'),
+    }).fillna(0)
+    topics['accuracy'] = np.where(topics['attempts'] > 0, topics['correct'] / topics['attempts'].clip(lower=1), np.nan)
+    topics = topics.sort_values(['attempts', 'views'], ascending=False)
+
+    intent = pd.Series(counts['intent'], dtype='float64')
+    intent_total = intent.sum()
+
+    def as_dict(series):
+        return {str(key): int(value) for key, value in series.items()}
+
+    total_correct = users['quiz_correct'].sum() if not users.empty else 0
+    total_quiz = users['quiz_total'].sum() if not users.empty else 0
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "learners": int(len(users)),
+        "history_rows": int(users['history_length'].sum()) if not users.empty else 0,
+        "new_history_rows": int(new_rows),
+        "topics": [
+            {
+                "topic": topic,
+                "views": int(row.views),
+                "quiz_attempts": int(row.attempts),
+                "quiz_correct": int(row.correct),
+                "accuracy": None if np.isnan(row.accuracy) else round(float(row.accuracy), 3)
+            }
+            for topic, row in topics.iterrows()
+        ],
+        "intent_mix": {
+            label: round(float(count) / intent_total, 3) for label, count in intent.sort_values(ascending=False).items()
+        } if intent_total else {},
+        "languages": {
+            "history": counts['language'],
+            "script": counts['script'],
+            "preferred": as_dict(users['preferred_language'].value_counts()) if not users.empty else {},
+            "last_voice": as_dict(users['last_voice_language'].value_counts()) if not users.empty else {},
+        },
+        "entry_types": counts['entry_type'],
+        "overall_quiz_accuracy": round(float(total_correct) / total_quiz, 3) if total_quiz else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learner history analytics for Bharat AI Tutor")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="Path to user_data.json")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE,
+                        help="Incremental state file (processed offsets + running counts)")
+    parser.add_argument("--full", action="store_true", help="Ignore saved state and rebuild from scratch")
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    args = parser.parse_args()
+
+    print(f"📊 Analysing learner history in {args.data}...", file=sys.stderr)
+    report = run_analytics(args.data, args.state, full=args.full)
+    print(f"✅ {report['learners']} learners, {report['new_history_rows']} new history rows processed", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
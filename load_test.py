@@ -0,0 +1,295 @@
+# load_test.py - Concurrent Load Test Harness for the Voice Pipeline
+import sys
+import os
+import time
+import json
+import glob
+import uuid
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+
+try:
+    import resource
+except ImportError:  # Windows: reaped-children CPU time is not available
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON = sys.executable
+
+# Matches the exec() timeouts index.js applies to transcribe.py / speak.py
+REQUEST_TIMEOUT_SECONDS = 90
+
+SYNTHETIC_TEXTS = [
+    ('en', "What is photosynthesis? Plants use sunlight, water and carbon dioxide to make food."),
+    ('en', "Definition: An algorithm is a step by step procedure to solve a problem. Example: binary search."),
+    ('en', "Explain Newton's laws of motion with one example from daily life."),
+    ('hi', "प्रकाश संश्लेषण क्या है? पौधे सूर्य के प्रकाश से अपना भोजन बनाते हैं।"),
+    ('hi', "गणित में बीजगणित क्या है? इसमें हम अज्ञात संख्याओं के लिए अक्षरों का उपयोग करते हैं।"),
+    ('hi', "मशीन लर्निंग के बारे में बताओ और एक उदाहरण दो।"),
+]
+
+
+def find_audio_fixtures():
+    """Bundled MP3 fixtures replayed against transcribe.py."""
+    fixtures = [os.path.join(BASE_DIR, 'test.mp3')]
+    fixtures += sorted(glob.glob(os.path.join(BASE_DIR, 'reply_*.mp3')))
+    return [path for path in fixtures if os.path.exists(path)]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+class ResourceSampler:
+    """
+    Samples CPU utilisation and resident memory of every process spawned by
+    this harness (including grandchildren such as chunk workers) from /proc.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = []
+        self.in_flight = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+        self.available = os.path.isdir('/proc/self')
+
+    def _descendants(self):
+        parents = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                parents[int(entry)] = (int(fields[1]), fields)
+            except (OSError, IndexError, ValueError):
+                continue
+        found, frontier = {}, {os.getpid()}
+        while frontier:
+            children = {pid for pid, (ppid, _) in parents.items() if ppid in frontier and pid not in found}
+            for pid in children:
+                found[pid] = parents[pid][1]
+            frontier = children
+        return found
+
+    def _snapshot(self):
+        """Total CPU seconds (live descendants + reaped children) and live RSS bytes."""
+        cpu_seconds = 0.0
+        if resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_seconds = usage.ru_utime + usage.ru_stime
+        rss_bytes = 0
+        for fields in self._descendants().values():
+            # fields[11], fields[12] = utime, stime; fields[21] = rss pages
+            cpu_seconds += (int(fields[11]) + int(fields[12])) / self._clock_ticks
+            rss_bytes += int(fields[21]) * self._page_size
+        return cpu_seconds, rss_bytes
+
+    def _run(self):
+        start = time.time()
+        last_time, (last_cpu, _) = start, self._snapshot()
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            cpu, rss = self._snapshot()
+            self.samples.append({
+                "t": round(now - start, 2),
+                "cpu_percent": round(100.0 * max(0.0, cpu - last_cpu) / (now - last_time), 1),
+                "rss_mb": round(rss / (1024 * 1024), 1),
+                "in_flight": self.in_flight
+            })
+            last_time, last_cpu = now, cpu
+
+    def start(self):
+        if self.available:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.available:
+            self._thread.join()
+
+
+class ServeClient:
+    """Drives one long-running transcription_scheduler.py process over JSON lines."""
+
+    def __init__(self, model_size, env):
+        self.process = subprocess.Popen(
+            [PYTHON, os.path.join(BASE_DIR, 'transcription_scheduler.py'), '--model', model_size,
+             '--fallback-model', model_size],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8', env=env, cwd=BASE_DIR
+        )
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+
+    def _read_results(self):
+        for line in self.process.stdout:
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            with self._lock:
+                future = self._pending.pop(payload.get("job_id"), None)
+            if future:
+                future.set_result(payload)
+
+    def transcribe(self, path, timeout):
+        job_id = str(uuid.uuid4())[:8]
+        future = Future()
+        with self._lock:
+            self._pending[job_id] = future
+            self.process.stdin.write(json.dumps({"id": job_id, "path": path, "deadline": timeout}) + "\n")
+            self.process.stdin.flush()
+        return future.result(timeout=timeout)
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class LoadTest:
+    """Replays fixtures against the voice pipeline at a ramp of concurrency levels."""
+
+    def __init__(self, targets, mode, model_size, timeout):
+        self.targets = targets
+        self.mode = mode
+        self.model_size = model_size
+        self.timeout = timeout
+        self.fixtures = find_audio_fixtures()
+        # Coalescing would turn repeated TTS texts into one synthesis plus cache
+        # hits, so the harness would no longer measure synthesis throughput
+        self.env = dict(os.environ, TTS_BACKEND='fake', TTS_COALESCE='0', PYTHONIOENCODING='utf-8')
+        self.serve_client = None
+        self._sequence = 0
+        self._sequence_lock = threading.Lock()
+
+    def _next_work_item(self):
+        with self._sequence_lock:
+            index = self._sequence
+            self._sequence += 1
+        target = self.targets[index % len(self.targets)]
+        if target == 'transcribe':
+            return target, self.fixtures[index % len(self.fixtures)]
+        return target, SYNTHETIC_TEXTS[index % len(SYNTHETIC_TEXTS)]
+
+    def _run_cli(self, command):
+        process = subprocess.run(command, capture_output=True, text=True, encoding='utf-8',
+                                 timeout=self.timeout, env=self.env, cwd=BASE_DIR)
+        return process.returncode == 0, process.stdout
+
+    def run_one(self, sampler):
+        target, payload = self._next_work_item()
+        sampler.in_flight += 1
+        start = time.time()
+        outcome = "ok"
+        try:
+            if target == 'transcribe' and self.mode == 'serve':
+                result = self.serve_client.transcribe(payload, self.timeout)
+                if "error" in result:
+                    outcome = "error"
+            elif target == 'transcribe':
+                ok, stdout = self._run_cli([PYTHON, 'transcribe.py', payload, '--model', self.model_size])
+                if not ok or '"error"' in stdout:
+                    outcome = "error"
+            else:
+                lang_code, text = payload
+                ok, _ = self._run_cli([PYTHON, 'speak.py', lang_code, text])
+                outcome = "ok" if ok else "error"
+        except (subprocess.TimeoutExpired, TimeoutError):
+            outcome = "timeout"
+        except Exception as e:
+            print(f"❌ {target} request failed: {e}", file=sys.stderr)
+            outcome = "error"
+        finally:
+            sampler.in_flight -= 1
+        return {"target": target, "latency": time.time() - start, "outcome": outcome}
+
+    def run_stage(self, concurrency, requests, sampler):
+        print(f"🚦 Stage: concurrency={concurrency}, requests={requests}", file=sys.stderr)
+        stage_start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            records = list(pool.map(lambda _: self.run_one(sampler), range(requests)))
+        elapsed = time.time() - stage_start
+
+        stage = {"concurrency": concurrency, "requests": requests,
+                 "wall_time": round(elapsed, 2), "throughput_rps": round(requests / elapsed, 3)}
+        for target in self.targets:
+            target_records = [r for r in records if r["target"] == target]
+            if not target_records:
+                continue
+            latencies = sorted(r["latency"] for r in target_records if r["outcome"] == "ok")
+            stage[target] = {
+                "requests": len(target_records),
+                "latency": {
+                    "p50": percentile(latencies, 0.50), "p90": percentile(latencies, 0.90),
+                    "p95": percentile(latencies, 0.95), "p99": percentile(latencies, 0.99),
+                    "max": round(latencies[-1], 3) if latencies else None
+                },
+                "error_rate": round(sum(r["outcome"] == "error" for r in target_records) / len(target_records), 3),
+                "timeout_rate": round(sum(r["outcome"] == "timeout" for r in target_records) / len(target_records), 3),
+            }
+        print(f"   ⏱️ {stage['throughput_rps']} req/s over {stage['wall_time']}s", file=sys.stderr)
+        return stage
+
+    def run(self, ramp, requests_per_worker):
+        if 'transcribe' in self.targets and not self.fixtures:
+            raise FileNotFoundError("No MP3 fixtures found (expected test.mp3 / reply_*.mp3)")
+        if 'transcribe' in self.targets and self.mode == 'serve':
+            self.serve_client = ServeClient(self.model_size, self.env)
+
+        sampler = ResourceSampler()
+        sampler.start()
+        try:
+            stages = [self.run_stage(level, level * requests_per_worker, sampler) for level in ramp]
+        finally:
+            sampler.stop()
+            if self.serve_client:
+                self.serve_client.close()
+
+        return {
+            "mode": self.mode,
+            "targets": self.targets,
+            "model": self.model_size,
+            "tts_backend": "fake",
+            "timeout_seconds": self.timeout,
+            "cpu_count": os.cpu_count(),
+            "stages": stages,
+            "resources": sampler.samples,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for transcribe.py and speak.py")
+    parser.add_argument("--targets", default="transcribe,speak",
+                        help="Comma-separated: transcribe, speak")
+    parser.add_argument("--mode", choices=["cli", "serve"], default="cli",
+                        help="cli spawns one process per request; serve drives transcription_scheduler.py")
+    parser.add_argument("--ramp", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests-per-worker", type=int, default=3)
+    parser.add_argument("--model", default="tiny", help="Whisper model size for transcription")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS)
+    parser.add_argument("--output", default="load_test_report.json")
+    args = parser.parse_args()
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    ramp = [int(level) for level in args.ramp.split(",")]
+
+    print(f"🧪 Voice pipeline load test: targets={targets}, mode={args.mode}, ramp={ramp}", file=sys.stderr)
+    report = LoadTest(targets, args.mode, args.model, args.timeout).run(ramp, args.requests_per_worker)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📊 Report written to {args.output}", file=sys.stderr)
@@ -0,0 +1,142 @@
+# request_profiler.py - Opt-in Per-Request Profiling (cProfile, stack sampling, tracemalloc)
+import sys
+import os
+import time
+import threading
+import cProfile
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# REQUEST_PROFILE=1 (or "full") runs cProfile + stack sampling + tracemalloc;
+# "sample" skips cProfile for a lower-overhead view. Unset means no profiling.
+REQUEST_PROFILE_MODE = os.environ.get("REQUEST_PROFILE", "").strip().lower()
+SAMPLE_INTERVAL_SECONDS = float(os.environ.get("REQUEST_PROFILE_INTERVAL", 0.005))
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and counts
+    identical stacks, for flame graphs in collapsed-stack format.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """Profilers running for one request; artifacts are written on close()."""
+
+    def __init__(self, label, mode, artifact_base=None):
+        self.label = label
+        self.mode = mode
+        self.artifact_base = artifact_base
+        self.artifacts = []
+        self.profiler = cProfile.Profile() if mode != "sample" else None
+        self.sampler = StackSampler(threading.get_ident())
+        self._started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+        if self.profiler:
+            self.profiler.enable()
+
+    def close(self):
+        if self.profiler:
+            self.profiler.disable()
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self.start_time
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        base = self.artifact_base or os.path.join(os.getcwd(), f"{self.label}_{int(time.time() * 1000)}")
+        base = os.path.splitext(base)[0] + ".profile"
+        os.makedirs(os.path.dirname(os.path.abspath(base)), exist_ok=True)
+
+        if self.profiler:
+            self.profiler.dump_stats(base + ".prof")
+            self.artifacts.append(base + ".prof")
+        self.sampler.write_collapsed(base + ".collapsed")
+        self.artifacts.append(base + ".collapsed")
+
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        with open(base + ".alloc.txt", 'w', encoding='utf-8') as f:
+            f.write(f"# {self.label}: {elapsed:.3f}s wall, python heap peak {peak / 1024:.1f} KiB, "
+                    f"still allocated {current / 1024:.1f} KiB\n")
+            f.write(f"# top {TOP_ALLOCATIONS} allocation sites (size, count, traceback)\n")
+            for stat in snapshot.statistics('traceback')[:TOP_ALLOCATIONS]:
+                f.write(f"\n{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                for line in stat.traceback.format(most_recent_first=True):
+                    f.write(f"  {line}\n")
+        self.artifacts.append(base + ".alloc.txt")
+
+        print(f"🔬 Profile for {self.label} ({elapsed:.2f}s, peak {peak / (1024 * 1024):.1f} MiB): "
+              f"{', '.join(self.artifacts)}", file=sys.stderr)
+
+
+@contextmanager
+def request_profile(label: str, artifact_base: str = None, mode: str = None):
+    """
+    Profiles the enclosed request when `mode` (default: $REQUEST_PROFILE) is
+    set and yields the RequestProfile, whose `artifact_base` can be filled in
+    once the output path is known. Yields None when profiling is off, so the
+    production path only pays for this one check.
+    """
+    mode = mode if mode is not None else REQUEST_PROFILE_MODE
+    if not mode or mode in ("0", "off", "false"):
+        yield None
+        return
+
+    profile = RequestProfile(label, mode, artifact_base)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        try:
+            profile.close()
+        except Exception as e:  # never fail the request because of the profiler
+            print(f"⚠️ Could not write profile for {label}: {e}", file=sys.stderr)
@@ -0,0 +1,127 @@
+# short_context_benchmark.py - Full vs Reduced Audio-Context Latency and Transcript Diff
+import sys
+import json
+import time
+import difflib
+import argparse
+import statistics
+
+from transcribe import EnhancedEducationalTranscriber, SHORT_CONTEXT_MAX_SECONDS, whisper
+from decode_sweep import error_rates
+from load_test import find_audio_fixtures
+
+
+def time_encoder(transcriber, audio, repeats):
+    """Median encoder seconds for the full 30 s window and the reduced context."""
+    import torch
+
+    model = transcriber.model
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    full, reduced = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with torch.no_grad():
+            model.embed_audio(mel.unsqueeze(0))
+        full.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        transcriber.encode_reduced_context(model, audio)
+        reduced.append(time.perf_counter() - start)
+    return statistics.median(full), statistics.median(reduced)
+
+
+def time_path(method, filepath, repeats):
+    """Median end-to-end seconds of a transcriber path and its last result."""
+    seconds = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = method(filepath)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds), result
+
+
+def word_diff(full_text, short_text):
+    """Word-level changes from the full-context transcript to the short-context one."""
+    changes = []
+    matcher = difflib.SequenceMatcher(a=full_text.split(), b=short_text.split())
+    for tag, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        if tag != 'equal':
+            changes.append({"op": tag,
+                            "full": " ".join(matcher.a[a_start:a_end]),
+                            "short": " ".join(matcher.b[b_start:b_end])})
+    return changes
+
+
+def run_benchmark(fixtures, model_size, repeats):
+    transcriber = EnhancedEducationalTranscriber(model_size=model_size, short_context=True)
+    # Untimed warm-up of both paths so one-off allocations don't skew the first fixture
+    transcriber.transcribe_with_enhanced_context(fixtures[0])
+    transcriber.transcribe_short_context(fixtures[0])
+
+    rows = []
+    for filepath in fixtures:
+        audio = whisper.load_audio(filepath)
+        duration = len(audio) / whisper.audio.SAMPLE_RATE
+        full_encode, short_encode = time_encoder(transcriber, audio, repeats)
+        full_seconds, full_result = time_path(transcriber.transcribe_with_enhanced_context, filepath, repeats)
+        short_seconds, short_result = time_path(transcriber.transcribe_short_context, filepath, repeats)
+
+        full_text = full_result.get("text", full_result.get("error", ""))
+        short_text = short_result.get("text", short_result.get("error", ""))
+        wer, cer = error_rates(full_text, short_text)
+        row = {
+            "file": filepath,
+            "audio_seconds": round(duration, 2),
+            "short_context_applied": duration <= SHORT_CONTEXT_MAX_SECONDS,
+            "audio_ctx": short_result.get("audio_context", {}).get("audio_ctx"),
+            "encoder_seconds": {"full": round(full_encode, 3), "short": round(short_encode, 3),
+                                "speedup": round(full_encode / short_encode, 2) if short_encode else None},
+            "end_to_end_seconds": {"full": round(full_seconds, 3), "short": round(short_seconds, 3),
+                                   "speedup": round(full_seconds / short_seconds, 2) if short_seconds else None},
+            "full_text": full_text,
+            "short_text": short_text,
+            "identical": full_text == short_text,
+            "wer_vs_full": round(wer, 4),
+            "cer_vs_full": round(cer, 4),
+            "diff": word_diff(full_text, short_text),
+        }
+        rows.append(row)
+        print(f"📐 {filepath}: {duration:.1f}s audio, encoder {full_encode:.3f}s -> {short_encode:.3f}s, "
+              f"end-to-end {full_seconds:.2f}s -> {short_seconds:.2f}s, "
+              f"{'identical' if row['identical'] else f'WER {wer:.3f} vs full'}", file=sys.stderr)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and reduced audio-context transcription")
+    parser.add_argument("files", nargs="*", help="Audio files (default: bundled test.mp3 / reply_*.mp3)")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="short_context_report.json")
+    args = parser.parse_args()
+
+    fixtures = args.files or find_audio_fixtures()
+    if not fixtures:
+        print("❌ No audio fixtures found", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"🔬 Comparing full vs short audio context on {len(fixtures)} files with '{args.model}'...",
+          file=sys.stderr)
+    rows = run_benchmark(fixtures, args.model, args.repeats)
+    applied = [row for row in rows if row["short_context_applied"]]
+    summary = {
+        "model": args.model,
+        "short_context_max_seconds": SHORT_CONTEXT_MAX_SECONDS,
+        "files": len(rows),
+        "identical_transcripts": sum(row["identical"] for row in rows),
+        "median_encoder_speedup": statistics.median(row["encoder_seconds"]["speedup"] for row in applied)
+        if applied else None,
+        "median_end_to_end_speedup": statistics.median(row["end_to_end_seconds"]["speedup"] for row in applied)
+        if applied else None,
+        "mean_wer_vs_full": round(sum(row["wer_vs_full"] for row in rows) / len(rows), 4),
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"summary": summary, "results": rows}, f, indent=2, ensure_ascii=False)
+    print(f"✅ {json.dumps(summary)}", file=sys.stderr)
+    print(f"📊 Report written to {args.output}", file=sys.stderr)
@@ -1,11 +1,60 @@
 # speak.py - ULTIMATE Enhanced Text-to-Speech with Perfect Hindi/English Quality
 import sys
 import os
-from gtts import gTTS
 import uuid
 import re
+import hashlib
 import time
 import textwrap
+import json
+
+try:
+    import fcntl
+except ImportError:  # No cross-process locks (Windows): requests are not coalesced
+    fcntl = None
+
+from audio_probe import parse_mp3_frame_header
+from request_profiler import request_profile
+
+try:
+    from gtts import gTTS
+except ImportError:  # Only the offline 'fake' backend is usable without gTTS
+    gTTS = None
+
+# 'gtts' (default) calls Google TTS; 'fake' writes local silent MP3 audio so
+# load tests and offline runs never touch the network.
+TTS_BACKEND = os.environ.get("TTS_BACKEND", "gtts").lower()
+
+# Silent MPEG-1 Layer III frame: 32 kbps, 44.1 kHz, mono -> 104 bytes, 1152 samples
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x10, 0xC4]) + bytes(100)
+SILENT_MP3_FRAME_SECONDS = 1152 / 44100
+
+# Fixed phrases wrapped around short or truncated answers. They are rendered
+# once per language/voice into FRAGMENT_DIR and spliced in at the MP3 frame
+# level, so only the variable middle of a reply is sent to TTS.
+BOILERPLATE_PHRASES = {
+    'en': {
+        'intro': "Here is the explanation for your question.",
+        'outro': "Thank you for learning.",
+        'more': "ask for more details.",
+    },
+    'hi': {
+        'intro': "यहाँ आपके प्रश्न का उत्तर है।",
+        'outro': "धन्यवाद।",
+        'more': "और जानकारी के लिए पूछें।",
+    },
+}
+FRAGMENT_DIR = os.environ.get("TTS_FRAGMENT_DIR", os.path.join("audio", "fragments"))
+USE_FRAGMENTS = os.environ.get("TTS_FRAGMENTS", "1") != "0"
+
+# Single-flight coalescing: concurrent speak.py runs for the same normalized
+# text, language and voice share one synthesis through a lock + result file.
+COALESCE_DIR = os.environ.get("TTS_COALESCE_DIR", os.path.join("audio", "inflight"))
+USE_COALESCING = os.environ.get("TTS_COALESCE", "1") != "0"
+COALESCE_WAIT_SECONDS = 60  # index.js gives speak.py 90 s
+COALESCE_POLL_SECONDS = 0.05
+COALESCE_RESULT_TTL_SECONDS = 15
+COALESCE_PRUNE_SECONDS = 3600
 
 def clean_text_for_perfect_educational_speech(text):
     """Ultimate text cleaning specifically for perfect educational content delivery."""
@@ -224,11 +273,273 @@ def optimize_text_for_perfect_education(text, language='en'):
     
     return '. '.join(optimized_sentences)
 
-def generate_perfect_educational_speech(text, lang_code, output_dir="audio"):
-    """Generate the highest quality educational speech with perfect processing."""
+def write_fake_speech(text, lang_code, filepath):
+    """Offline TTS stand-in: silent MP3 sized to the estimated speaking time."""
+    duration = max(1.0, len(text) / (12 if lang_code == 'hi' else 15))
+    frames = int(duration / SILENT_MP3_FRAME_SECONDS) + 1
+    with open(filepath, 'wb') as f:
+        f.write(SILENT_MP3_FRAME * frames)
+
+def synthesize_speech_to_file(tts_params, filepath):
+    """Runs the configured TTS backend for `tts_params` and saves the MP3 to `filepath`."""
+    if TTS_BACKEND == 'fake':
+        write_fake_speech(tts_params['text'], tts_params['lang'], filepath)
+        return
+    if gTTS is None:
+        raise RuntimeError("gTTS is not installed (pip install gtts) - set TTS_BACKEND=fake for offline use")
+    gTTS(**tts_params).save(filepath)
+
+def build_tts_params(text, lang_code):
+    """gTTS parameters with perfect settings for education."""
+    tts_params = {
+        'text': text,
+        'lang': lang_code,
+        'slow': False,  # Normal speed for better comprehension
+    }
+    
+    # Language-specific optimizations
+    if lang_code == 'hi':
+        tts_params['tld'] = 'co.in'  # Indian Hindi accent
+    elif lang_code == 'en':
+        tts_params['tld'] = 'com'    # Clear American accent
+    else:
+        tts_params['tld'] = 'com'    # Default
+    return tts_params
+
+def split_mp3_frames(data):
+    """
+    Splits MP3 bytes into Layer III frames, skipping ID3 tags and the
+    Xing/Info header frame. Returns (frames, stream_format) where
+    stream_format is (version, sample_rate, channel_mode).
+    """
+    position = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        position = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+    
+    frames = []
+    stream_format = None
+    while position + 4 <= len(data):
+        header = parse_mp3_frame_header(data[position:position + 4])
+        if header is None:
+            if data[position:position + 3] == b'TAG':
+                break  # ID3v1 trailer
+            position += 1
+            continue
+        
+        length = header["length"]
+        frame = data[position:position + length]
+        if len(frame) < length:
+            break
+        
+        if not frames and (b'Xing' in frame[:64] or b'Info' in frame[:64]):
+            position += length
+            continue
+        frame_format = (header["version"], header["sample_rate"], header["channel_mode"])
+        if stream_format is None:
+            stream_format = frame_format
+        frames.append(frame)
+        position += length
+    return frames, stream_format
+
+def get_fragment_frames(phrase, lang_code):
+    """MP3 frames of a boilerplate phrase, rendering it into the fragment store on first use."""
+    tts_params = build_tts_params(phrase, lang_code)
+    key = hashlib.sha1(f"{TTS_BACKEND}|{lang_code}|{tts_params['tld']}|{phrase}".encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(FRAGMENT_DIR, f"{lang_code}_{key}.mp3")
+    
+    if not os.path.exists(path):
+        os.makedirs(FRAGMENT_DIR, exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        synthesize_speech_to_file(tts_params, temp_path)
+        os.replace(temp_path, path)  # atomic, so concurrent renders never expose partial files
+        print(f"🧩 Rendered TTS fragment: {phrase}", file=sys.stderr)
+    
+    with open(path, 'rb') as f:
+        return split_mp3_frames(f.read())
+
+def synthesize_with_fragments(parts, lang_code, filepath):
+    """
+    Synthesizes only the variable parts of `parts` ((text, is_boilerplate)
+    pairs), takes boilerplate from the fragment store and splices everything
+    at the MP3 frame level into `filepath`.
+    """
+    spliced = []
+    stream_format = None
+    for text, is_boilerplate in parts:
+        if is_boilerplate:
+            frames, frame_format = get_fragment_frames(text, lang_code)
+        else:
+            temp_path = f"{filepath}.body.tmp"
+            try:
+                synthesize_speech_to_file(build_tts_params(text, lang_code), temp_path)
+                with open(temp_path, 'rb') as f:
+                    frames, frame_format = split_mp3_frames(f.read())
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        
+        if not frames:
+            raise ValueError(f"No MP3 frames found for: {text[:40]}")
+        if stream_format is not None and frame_format != stream_format:
+            raise ValueError(f"Incompatible MP3 streams {stream_format} vs {frame_format}")
+        stream_format = frame_format
+        spliced.extend(frames)
+    
+    with open(filepath, 'wb') as f:
+        f.write(b''.join(spliced))
+
+def prerender_fragments(languages=('en', 'hi')):
+    """Renders every boilerplate phrase for `languages` into the fragment store."""
+    for lang_code in languages:
+        phrases = BOILERPLATE_PHRASES['hi' if lang_code == 'hi' else 'en']
+        for phrase in phrases.values():
+            get_fragment_frames(phrase, lang_code)
+
+def coalesce_key(clean_text, lang_code):
+    """Identity of a synthesis: backend, language, voice and the normalized text."""
+    tld = build_tts_params(clean_text, lang_code)['tld']
+    return hashlib.sha1(f"{TTS_BACKEND}|{lang_code}|{tld}|{clean_text}".encode('utf-8')).hexdigest()[:16]
+
+def _read_coalesced_result(result_path, output_dir):
+    """Filename published by a finished identical request, if still fresh and on disk."""
+    try:
+        with open(result_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - result.get('created_at', 0) > COALESCE_RESULT_TTL_SECONDS:
+        return None
+    if not os.path.exists(os.path.join(output_dir, result.get('filename', ''))):
+        return None
+    return result['filename']
+
+def _prune_coalesce_dir():
+    cutoff = time.time() - COALESCE_PRUNE_SECONDS
+    for name in os.listdir(COALESCE_DIR):
+        path = os.path.join(COALESCE_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def coalesced_synthesis(key, output_dir, synthesize):
+    """
+    Single-flight wrapper around `synthesize` (which returns a filename in
+    `output_dir`). The first process to take the per-key lock synthesizes
+    and publishes its filename; identical requests arriving meanwhile wait
+    on the lock and return the same file instead of calling TTS again.
+    """
+    if fcntl is None:
+        return synthesize()
+    
+    os.makedirs(COALESCE_DIR, exist_ok=True)
+    lock_path = os.path.join(COALESCE_DIR, f"{key}.lock")
+    result_path = os.path.join(COALESCE_DIR, f"{key}.json")
+    
+    with open(lock_path, 'a') as lock_file:
+        deadline = time.time() + COALESCE_WAIT_SECONDS
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waiting:
+                    print("⏳ Identical TTS request in flight, waiting for its audio...", file=sys.stderr)
+                    waiting = True
+                if time.time() > deadline:
+                    print("⚠️ Waited too long for identical request, synthesizing independently", file=sys.stderr)
+                    return synthesize()
+                time.sleep(COALESCE_POLL_SECONDS)
+        
+        try:
+            os.utime(lock_path)
+            shared = _read_coalesced_result(result_path, output_dir)
+            if shared:
+                print(f"🔗 Reusing audio from identical request: {shared}", file=sys.stderr)
+                return shared
+            
+            filename = synthesize()
+            if filename:
+                temp_path = f"{result_path}.{uuid.uuid4().hex[:8]}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'filename': filename, 'created_at': time.time()}, f)
+                os.replace(temp_path, result_path)
+                _prune_coalesce_dir()
+            return filename
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def render_speech_file(parts, body_text, clean_text, lang_code, output_dir):
+    """Synthesizes `parts` into a new MP3 in `output_dir`, with retries. Returns the filename or None."""
     max_retries = 3
     retry_delay = 1
     
+    # Generate unique filename with timestamp
+    timestamp = int(time.time())
+    unique_id = str(uuid.uuid4())[:8]
+    filename = f"perfect_speech_{lang_code}_{timestamp}_{unique_id}.mp3"
+    filepath = os.path.join(output_dir, filename)
+    
+    print(f"🎙️ Generating PERFECT TTS for ({lang_code}): {clean_text[:100]}{'...' if len(clean_text) > 100 else ''}", file=sys.stderr)
+    
+    # Perfect TTS generation with enhanced retry mechanism
+    for attempt in range(max_retries):
+        try:
+            print(f"🔄 Perfect TTS attempt {attempt + 1}/{max_retries}", file=sys.stderr)
+            
+            # Synthesize and save the audio file; boilerplate comes from the
+            # fragment store when possible, else the whole text is synthesized
+            spliced = False
+            if USE_FRAGMENTS and len(parts) > 1:
+                try:
+                    synthesize_with_fragments(parts, lang_code, filepath)
+                    spliced = True
+                    print(f"🧩 Spliced fragments; synthesized {len(body_text)} of {len(clean_text)} characters", file=sys.stderr)
+                except Exception as fragment_error:
+                    print(f"⚠️ Fragment splicing failed ({fragment_error}), synthesizing full text", file=sys.stderr)
+            if not spliced:
+                synthesize_speech_to_file(build_tts_params(clean_text, lang_code), filepath)
+            
+            # Verify file creation and content
+            if os.path.exists(filepath) and os.path.getsize(filepath) > 1000:  # Minimum 1KB for valid audio
+                file_size = os.path.getsize(filepath)
+                duration_estimate = len(clean_text) / (12 if lang_code == 'hi' else 15)  # Hindi is slower
+                
+                print(f"✅ PERFECT educational audio created successfully!", file=sys.stderr)
+                print(f"   📁 File: {filename}", file=sys.stderr)
+                print(f"   📊 Size: {file_size} bytes", file=sys.stderr)
+                print(f"   ⏱️ Estimated duration: {duration_estimate:.1f} seconds", file=sys.stderr)
+                print(f"   🌐 Language: {lang_code} ({'Hindi' if lang_code == 'hi' else 'English'})", file=sys.stderr)
+                
+                return filename
+            else:
+                raise Exception("Generated audio file is invalid or too small")
+                
+        except Exception as e:
+            print(f"❌ Perfect TTS attempt {attempt + 1} failed: {str(e)}", file=sys.stderr)
+            
+            # Clean up failed file
+            if os.path.exists(filepath):
+                try:
+                    os.remove(filepath)
+                except:
+                    pass
+            
+            # Wait before retry (exponential backoff)
+            if attempt < max_retries - 1:
+                wait_time = retry_delay * (2 ** attempt)
+                print(f"⏳ Waiting {wait_time} seconds before retry...", file=sys.stderr)
+                time.sleep(wait_time)
+            else:
+                print("💔 All perfect TTS attempts failed", file=sys.stderr)
+                return None
+
+def generate_perfect_educational_speech(text, lang_code, output_dir="audio"):
+    """Generate the highest quality educational speech with perfect processing."""
+    
     try:
         # Ensure output directory exists
         if not os.path.exists(output_dir):
@@ -261,6 +572,11 @@ def generate_perfect_educational_speech(text, lang_code, output_dir="audio"):
             else:
                 clean_text = "I'm happy you're learning. Please ask your question again."
         
+        # Fixed wrapper phrases, kept apart so they can come from the fragment store
+        phrases = BOILERPLATE_PHRASES['hi' if lang_code == 'hi' else 'en']
+        prefix_phrase = None
+        suffix_phrase = None
+        
         # Perfect text length management for optimal TTS
         optimal_length = 900 if lang_code == 'hi' else 1100  # Hindi needs shorter segments
         
@@ -287,87 +603,28 @@ def generate_perfect_educational_speech(text, lang_code, output_dir="audio"):
                     else:
                         break
                 
-                if lang_code == 'hi':
-                    optimized_text = optimized_text.strip() + '... और जानकारी के लिए पूछें।'
-                else:
-                    optimized_text = optimized_text.strip() + '... ask for more details.'
+                optimized_text = optimized_text.strip() + '...'
+                suffix_phrase = phrases['more']
             
             clean_text = optimized_text
             print(f"✂️ Text optimized to {len(clean_text)} characters", file=sys.stderr)
         
         # Ensure minimum meaningful length
         if len(clean_text) < 30:
-            if lang_code == 'hi':
-                clean_text = f"यहाँ आपके प्रश्न का उत्तर है। {clean_text}। धन्यवाद।"
-            else:
-                clean_text = f"Here is the explanation for your question. {clean_text}. Thank you for learning."
+            prefix_phrase = phrases['intro']
+            suffix_phrase = phrases['outro']
+            clean_text = f"{clean_text}।" if lang_code == 'hi' else f"{clean_text}."
         
-        # Generate unique filename with timestamp
-        timestamp = int(time.time())
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"perfect_speech_{lang_code}_{timestamp}_{unique_id}.mp3"
-        filepath = os.path.join(output_dir, filename)
+        parts = [(text, is_boilerplate) for text, is_boilerplate in
+                 ((prefix_phrase, True), (clean_text, False), (suffix_phrase, True)) if text]
+        body_text = clean_text
+        clean_text = ' '.join(text for text, _ in parts)
         
-        print(f"🎙️ Generating PERFECT TTS for ({lang_code}): {clean_text[:100]}{'...' if len(clean_text) > 100 else ''}", file=sys.stderr)
-        
-        # Perfect TTS generation with enhanced retry mechanism
-        for attempt in range(max_retries):
-            try:
-                print(f"🔄 Perfect TTS attempt {attempt + 1}/{max_retries}", file=sys.stderr)
-                
-                # Create TTS object with perfect settings for education
-                tts_params = {
-                    'text': clean_text,
-                    'lang': lang_code,
-                    'slow': False,  # Normal speed for better comprehension
-                }
-                
-                # Language-specific optimizations
-                if lang_code == 'hi':
-                    tts_params['tld'] = 'co.in'  # Indian Hindi accent
-                elif lang_code == 'en':
-                    tts_params['tld'] = 'com'    # Clear American accent
-                else:
-                    tts_params['tld'] = 'com'    # Default
-                
-                tts = gTTS(**tts_params)
-                
-                # Save the audio file
-                tts.save(filepath)
-                
-                # Verify file creation and content
-                if os.path.exists(filepath) and os.path.getsize(filepath) > 1000:  # Minimum 1KB for valid audio
-                    file_size = os.path.getsize(filepath)
-                    duration_estimate = len(clean_text) / (12 if lang_code == 'hi' else 15)  # Hindi is slower
-                    
-                    print(f"✅ PERFECT educational audio created successfully!", file=sys.stderr)
-                    print(f"   📁 File: {filename}", file=sys.stderr)
-                    print(f"   📊 Size: {file_size} bytes", file=sys.stderr)
-                    print(f"   ⏱️ Estimated duration: {duration_estimate:.1f} seconds", file=sys.stderr)
-                    print(f"   🌐 Language: {lang_code} ({'Hindi' if lang_code == 'hi' else 'English'})", file=sys.stderr)
-                    
-                    return filename
-                else:
-                    raise Exception("Generated audio file is invalid or too small")
-                    
-            except Exception as e:
-                print(f"❌ Perfect TTS attempt {attempt + 1} failed: {str(e)}", file=sys.stderr)
-                
-                # Clean up failed file
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass
-                
-                # Wait before retry (exponential backoff)
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    print(f"⏳ Waiting {wait_time} seconds before retry...", file=sys.stderr)
-                    time.sleep(wait_time)
-                else:
-                    print("💔 All perfect TTS attempts failed", file=sys.stderr)
-                    return None
+        # Identical concurrent requests share one synthesis and one file
+        render = lambda: render_speech_file(parts, body_text, clean_text, lang_code, output_dir)
+        if USE_COALESCING:
+            return coalesced_synthesis(coalesce_key(clean_text, lang_code), output_dir, render)
+        return render()
         
     except Exception as e:
         print(f"🚨 Critical error in perfect educational TTS generation: {str(e)}", file=sys.stderr)
@@ -411,6 +668,11 @@ def test_perfect_educational_tts():
         return False
 
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == '--prerender-fragments':
+        prerender_fragments(sys.argv[2:] or ('en', 'hi'))
+        print(f"✅ Boilerplate fragments ready in {FRAGMENT_DIR}", file=sys.stderr)
+        sys.exit(0)
+    
     if len(sys.argv) < 3:
         print("Usage: python speak.py [lang_code] [text_to_speak]", file=sys.stderr)
         print("PERFECT Enhanced for educational content with crystal clear voice explanations", file=sys.stderr)
@@ -438,8 +700,12 @@ if __name__ == "__main__":
     print(f"📝 Content length: {len(text_to_speak)} characters", file=sys.stderr)
     
     # Generate perfect educational speech
+    # REQUEST_PROFILE=1 writes profile artifacts next to the generated MP3
     start_time = time.time()
-    output_filename = generate_perfect_educational_speech(text_to_speak, lang_code)
+    with request_profile("speak") as profile:
+        output_filename = generate_perfect_educational_speech(text_to_speak, lang_code)
+        if profile and output_filename:
+            profile.artifact_base = os.path.join("audio", output_filename)
     end_time = time.time()
     
     if output_filename:
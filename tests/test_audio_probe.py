@@ -0,0 +1,121 @@
+# test_audio_probe.py - Header Probing on Synthetic MP3/FLAC Files
+import os
+import sys
+import random
+import struct
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_probe import AudioProbeError, probe_audio, validate_audio
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono: 417-byte frames of 1152 samples
+FRAME_HEADER = b'\xff\xfb\x90\xc0'
+FRAME_LENGTH = 417
+FRAME_SECONDS = 1152 / 44100
+SIDE_INFO_BYTES = 17  # MPEG-1 mono, where encoders put the Xing/Info tag
+
+
+def mp3_frame(payload: bytes = b'') -> bytes:
+    return (FRAME_HEADER + payload).ljust(FRAME_LENGTH, b'\x00')
+
+
+def xing_frame(tag: bytes, frames: int, stream_bytes: int = None) -> bytes:
+    flags = 0x01 | (0x02 if stream_bytes is not None else 0)
+    fields = struct.pack('>II', flags, frames)
+    if stream_bytes is not None:
+        fields += struct.pack('>I', stream_bytes)
+    return mp3_frame(b'\x00' * SIDE_INFO_BYTES + tag + fields)
+
+
+def id3v2_tag(payload: bytes) -> bytes:
+    size = len(payload)
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b'ID3\x04\x00\x00' + synchsafe + payload
+
+
+def flac_file(sample_rate: int, total_samples: int, channels: int = 1) -> bytes:
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + packed.to_bytes(8, 'big') + b'\x00' * 16
+    return b'fLaC' + bytes([0x80, 0, 0, len(streaminfo)]) + streaminfo + b'\x00' * 64
+
+
+@pytest.fixture
+def write_audio(tmp_path):
+    def write(name: str, data: bytes) -> str:
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+def test_frame_walk_counts_every_frame(write_audio):
+    info = probe_audio(write_audio("cbr.mp3", mp3_frame() * 50))
+    assert info["format"] == "mp3"
+    assert info["duration_method"] == "frames"
+    assert info["sample_rate"] == 44100 and info["channels"] == 1
+    assert info["duration"] == pytest.approx(50 * FRAME_SECONDS, abs=1e-3)
+
+
+def test_xing_frame_count_is_used_instead_of_walking(write_audio):
+    # The Xing frame is itself counted in the stream byte total
+    data = xing_frame(b'Xing', 40, 41 * FRAME_LENGTH) + mp3_frame() * 40
+    info = probe_audio(write_audio("vbr.mp3", data))
+    assert info["duration_method"] == "xing"
+    assert info["duration"] == pytest.approx(40 * FRAME_SECONDS, abs=1e-3)
+
+
+def test_truncated_file_with_xing_byte_count_is_rejected(write_audio):
+    data = xing_frame(b'Xing', 1000, 1001 * FRAME_LENGTH) + mp3_frame() * 20
+    path = write_audio("cut.mp3", data)
+    with pytest.raises(AudioProbeError, match="Truncated"):
+        probe_audio(path)
+    with pytest.raises(AudioProbeError):
+        validate_audio(path, max_duration=1800)
+
+
+def test_truncated_cbr_info_without_byte_count_is_rejected(write_audio):
+    data = xing_frame(b'Info', 1000) + mp3_frame() * 20
+    with pytest.raises(AudioProbeError, match="Truncated"):
+        probe_audio(write_audio("cut_cbr.mp3", data))
+
+
+def test_trailing_id3v1_tag_does_not_count_as_stream(write_audio):
+    data = xing_frame(b'Xing', 30, 31 * FRAME_LENGTH) + mp3_frame() * 30 + b'TAG'.ljust(128, b'\x00')
+    info = probe_audio(write_audio("id3v1.mp3", data))
+    assert info["duration"] == pytest.approx(30 * FRAME_SECONDS, abs=1e-3)
+
+
+def test_frames_are_found_after_id3v2_tag(write_audio):
+    # A sync word inside the tag must not be mistaken for the first frame
+    tag = id3v2_tag(b'\x00' * 100 + FRAME_HEADER + b'\x00' * 300)
+    info = probe_audio(write_audio("tagged.mp3", tag + mp3_frame() * 25))
+    assert info["format"] == "mp3"
+    assert info["duration"] == pytest.approx(25 * FRAME_SECONDS, abs=1e-3)
+
+
+def test_flac_duration_from_streaminfo(write_audio):
+    info = probe_audio(write_audio("known.flac", flac_file(16000, 16000 * 3)))
+    assert info["format"] == "flac"
+    assert info["sample_rate"] == 16000 and info["channels"] == 1
+    assert info["duration"] == pytest.approx(3.0)
+
+
+def test_flac_with_unknown_length_has_no_duration(write_audio):
+    path = write_audio("streamed.flac", flac_file(16000, 0))
+    assert probe_audio(path)["duration"] is None
+    # Unknown length is left to ffmpeg rather than rejected as too short
+    assert validate_audio(path, min_duration=0.3)["format"] == "flac"
+
+
+def test_random_bytes_are_not_identified(write_audio):
+    data = random.Random(0).randbytes(8192)
+    info = probe_audio(write_audio("noise.bin", data))
+    assert info["format"] == "unknown"
+    assert info["duration"] is None
+
+
+def test_empty_file_is_rejected(write_audio):
+    with pytest.raises(AudioProbeError, match="empty"):
+        probe_audio(write_audio("empty.mp3", b''))
@@ -1,26 +1,567 @@
 # transcribe.py - ENHANCED Audio Transcription with Perfect Hindi/English Recognition
-import whisper
 import sys
 import os
+import importlib.util
 import time
 import re
 import json
+import argparse
+import multiprocessing
+import shutil
+import subprocess
+import copy
+import dataclasses
+import platform
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import warnings
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # No cross-process locks (Windows): autotuning never pins CPUs
+    fcntl = None
+from audio_probe import AudioProbeError, probe_audio, validate_audio
+from request_profiler import REQUEST_PROFILE_MODE, request_profile
 warnings.filterwarnings("ignore")
 
+
+def _lazy_import(name):
+    """Imports `name` on first attribute access, so text-only users skip torch."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+whisper = _lazy_import("whisper")
+
+# Long-audio mode: recordings are cut at quiet points into windows that,
+# together with the overlap on both sides, still fit one 30 s Whisper window.
+LONG_AUDIO_THRESHOLD_SECONDS = 60.0
+LONG_AUDIO_CHUNK_SECONDS = 28.0
+LONG_AUDIO_OVERLAP_SECONDS = 1.0
+LONG_AUDIO_SEARCH_SECONDS = 4.0
+ENERGY_FRAME_SECONDS = 0.025
+
+# index.js re-encodes every voice note to 128 kbps MP3 before transcription
+ASSUMED_BYTES_PER_SECOND = 128 * 1000 // 8
+
+# Voice notes outside these bounds are rejected from their headers, before
+# any model is loaded or audio decoded.
+MAX_AUDIO_SECONDS = float(os.environ.get("TRANSCRIBE_MAX_SECONDS", 30 * 60))
+MIN_AUDIO_SECONDS = 0.3
+
+# Model selection: candidates from most to least accurate, with the resident
+# memory each needs on CPU (fp32 weights + decoder working set) and default
+# decode throughput (seconds of compute per second of audio) until the host
+# has calibrated its own figures.
+MODEL_PREFERENCE = ['medium', 'small', 'base', 'tiny']
+DEFAULT_MAX_MODEL = 'small'  # 'medium' only when explicitly requested
+MODEL_MEMORY_MB = {'tiny': 500, 'base': 800, 'small': 1800, 'medium': 4500}
+DEFAULT_REALTIME_FACTORS = {'tiny': 0.15, 'base': 0.3, 'small': 0.9, 'medium': 2.5}
+DEFAULT_LOAD_SECONDS = {'tiny': 1.0, 'base': 2.0, 'small': 5.0, 'medium': 15.0}
+DEFAULT_LATENCY_TARGET_SECONDS = 60.0  # index.js kills transcribe.py after 90 s
+MEMORY_HEADROOM_MB = 300
+CALIBRATION_FILE = os.environ.get(
+    "TRANSCRIBE_CALIBRATION_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "model_calibration.json")
+)
+RUNTIME_PROFILE_FILE = os.environ.get(
+    "TRANSCRIBE_PROFILE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "runtime_profile.json")
+)
+
+# Thread autotuning: torch thread/affinity settings benchmarked per host,
+# model and number of concurrent transcriptions, persisted between runs.
+THREAD_TUNING_FILE = os.environ.get(
+    "TRANSCRIBE_TUNING_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "thread_tuning.json")
+)
+AFFINITY_SLOT_DIR = os.path.join(os.path.dirname(THREAD_TUNING_FILE), "affinity_slots")
+AUTOTUNE_RUNS = 2
+AUTOTUNE_SAMPLE_TOKENS = 8
+AUTOTUNE_TIE_TOLERANCE = 0.05  # prefer fewer threads within 5% of the fastest
+AUTOTUNE_BUDGET_SECONDS = 10.0  # tuning runs inside a request index.js kills after 90 s
+_THREAD_TUNING_LOCK = threading.Lock()
+_affinity_slot = None  # (slot index, locked slot file) held for the process lifetime
+
+# Cascade mode: a fast greedy pass answers unless any of these signals says
+# the transcript is unreliable, in which case the full model re-decodes.
+CASCADE_FAST_MODEL = 'tiny'
+DEFAULT_CASCADE_THRESHOLDS = {
+    "min_avg_logprob": -0.8,
+    "max_no_speech_prob": 0.6,
+    "max_compression_ratio": 2.4,
+    "min_confidence": "medium"
+}
+CONFIDENCE_RANK = {"low": 0, "medium": 1, "high": 2}
+
+# Short-context mode: clips up to this long are encoded over a mel window
+# sized to the clip (plus a little trailing silence, rounded up to whole
+# seconds) instead of the full 30 s / 3000-frame window.
+SHORT_CONTEXT_MAX_SECONDS = float(os.environ.get("TRANSCRIBE_SHORT_CONTEXT_MAX", 10.0))
+SHORT_CONTEXT_PAD_SECONDS = 1.0
+SHORT_CONTEXT_STEP_FRAMES = 100  # 1 s of mel frames
+
+# Question intent patterns, labelled so analytics can report an intent mix
+QUESTION_INTENT_PATTERNS = [
+    # English patterns
+    ('english_question', r'^\s*(what is|what are|what\'s|whats|explain|define|tell me about|how does|how do|why is|why are|can you explain)\b'),
+    ('quiz_or_help', r'\b(quiz|test|question|help|help me)\b'),
+    ('question_mark', r'\?$'),
+    
+    # Hindi patterns (Devanagari)
+    ('hindi_question', r'\b(क्या है|क्या हैं|समझाओ|बताओ|सिखाओ|व्याख्या करो|परिभाषा दो)\b'),
+    ('hindi_question', r'\b(कैसे|क्यों|कहाँ|कब|कौन)\b'),
+    ('quiz_or_help', r'\b(प्रश्न|सवाल|सहायता|मदद)\b'),
+    
+    # Romanized Hindi patterns
+    ('hinglish_question', r'\b(kya hai|kya hain|samjhao|batao|sikhaao|kaise|kyun|kahan|kab|kaun)\b'),
+    ('quiz_or_help', r'\b(prashn|sawal|madad|sahayata)\b')
+]
+
+
+def classify_question_intent(text: str) -> str:
+    """
+    Labels the question intent of `text`: the first matching pattern label,
+    'heuristic' when only the fallback heuristics fire, else 'statement'.
+    """
+    for label, pattern in QUESTION_INTENT_PATTERNS:
+        if re.search(pattern, text, re.IGNORECASE):
+            return label
+    
+    # Additional heuristics
+    words = text.split()
+    lowered = text.lower()
+    question_indicators = [
+        text.strip().endswith('?'),
+        len(words) >= 2 and words[0].lower() in ['what', 'how', 'why', 'when', 'where', 'which', 'who'],
+        'explain' in lowered,
+        'tell me' in lowered,
+        'teach me' in lowered,
+        'क्या' in text or 'कैसे' in text or 'क्यों' in text,
+        'samjhao' in lowered or 'batao' in lowered
+    ]
+    return 'heuristic' if any(question_indicators) else 'statement'
+
+
+_chunk_worker_model = None
+
+
+def _init_chunk_worker(model_size: str, threads_per_worker: int):
+    """Process-pool initializer: load one Whisper model per worker process."""
+    global _chunk_worker_model
+    warnings.filterwarnings("ignore")
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    _chunk_worker_model = whisper.load_model(model_size)
+
+
+def _transcribe_chunk(job):
+    """Transcribe one chunk of a long recording inside a worker process."""
+    index, audio_chunk, decode_options = job
+    result = _chunk_worker_model.transcribe(audio_chunk, **decode_options)
+    return index, result
+
+
+def find_low_energy_cuts(audio, sample_rate: int,
+                         chunk_seconds: float = LONG_AUDIO_CHUNK_SECONDS,
+                         search_seconds: float = LONG_AUDIO_SEARCH_SECONDS) -> list:
+    """
+    Returns sample offsets [0, ..., len(audio)] splitting the audio into chunks of
+    at most `chunk_seconds`, each cut placed at the quietest 25 ms frame found in
+    the `search_seconds` leading up to the nominal cut point.
+    """
+    frame = max(1, int(ENERGY_FRAME_SECONDS * sample_rate))
+    n_frames = len(audio) // frame
+    energy = np.sqrt(np.mean(np.square(audio[:n_frames * frame].reshape(n_frames, frame)), axis=1))
+
+    chunk_samples = int(chunk_seconds * sample_rate)
+    search_samples = int(search_seconds * sample_rate)
+    cuts = [0]
+    while len(audio) - cuts[-1] > chunk_samples:
+        target = cuts[-1] + chunk_samples
+        lo_frame = max(cuts[-1] + 1, target - search_samples) // frame
+        hi_frame = min(target // frame, n_frames)
+        if hi_frame <= lo_frame:
+            cuts.append(target)
+            continue
+        quietest = lo_frame + int(np.argmin(energy[lo_frame:hi_frame]))
+        cuts.append(quietest * frame + frame // 2)
+    cuts.append(len(audio))
+    return cuts
+
+
+def estimate_audio_duration(filepath: str, audio_info: dict = None) -> float:
+    """
+    Cheap duration estimate in seconds: reads the container/frame headers
+    (or reuses `audio_info`, an earlier probe_audio() result for the file),
+    then asks ffprobe for formats the probe can't time, and finally falls
+    back to file size at the bitrate index.js encodes at.
+    """
+    try:
+        duration = (audio_info or probe_audio(filepath))["duration"]
+        if duration is not None:
+            return duration
+    except AudioProbeError:
+        pass
+    if shutil.which("ffprobe"):
+        try:
+            probe = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=noprint_wrappers=1:nokey=1", filepath],
+                capture_output=True, text=True, timeout=10
+            )
+            return float(probe.stdout.strip())
+        except (ValueError, subprocess.SubprocessError):
+            pass
+    return os.path.getsize(filepath) / ASSUMED_BYTES_PER_SECOND
+
+
+def get_host_resources() -> dict:
+    """Available memory (MB), logical cores and 1-minute load average of this host."""
+    available_mb = None
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available_mb = int(line.split()[1]) // 1024
+                    break
+    except OSError:
+        pass
+    if available_mb is None and hasattr(os, 'sysconf'):
+        try:
+            available_mb = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        except (ValueError, OSError):
+            pass
+
+    try:
+        load_average = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        load_average = 0.0
+
+    return {
+        "available_memory_mb": available_mb,
+        "cpu_count": os.cpu_count() or 1,
+        "load_average": round(load_average, 2)
+    }
+
+
+def load_calibration() -> dict:
+    """Per-model throughput measured on this host ({} until the first run)."""
+    try:
+        with open(CALIBRATION_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def record_calibration(model_size: str, audio_seconds: float, transcribe_seconds: float,
+                       load_seconds: float = None):
+    """Folds one observed run into the host calibration (exponential moving average)."""
+    if audio_seconds <= 0:
+        return
+    try:
+        with open(CALIBRATION_FILE, 'r', encoding='utf-8') as f:
+            calibration = json.load(f)
+    except FileNotFoundError:
+        calibration = {}
+    except (OSError, json.JSONDecodeError) as e:
+        # Rewriting from {} would erase every other model's calibration
+        print(f"⚠️ Not updating unreadable model calibration: {e}", file=sys.stderr)
+        return
+    entry = calibration.get(model_size, {})
+    observed = transcribe_seconds / audio_seconds
+    entry["realtime_factor"] = round(0.8 * entry["realtime_factor"] + 0.2 * observed, 4) \
+        if "realtime_factor" in entry else round(observed, 4)
+    if load_seconds is not None:
+        entry["load_seconds"] = round(0.8 * entry["load_seconds"] + 0.2 * load_seconds, 3) \
+            if "load_seconds" in entry else round(load_seconds, 3)
+    entry["samples"] = entry.get("samples", 0) + 1
+    calibration[model_size] = entry
+    try:
+        os.makedirs(os.path.dirname(CALIBRATION_FILE), exist_ok=True)
+        temp_path = f"{CALIBRATION_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(calibration, f, indent=2)
+        os.replace(temp_path, CALIBRATION_FILE)  # readers never see a half-written file
+    except OSError as e:
+        print(f"⚠️ Could not save model calibration: {e}", file=sys.stderr)
+
+
+def usable_cores() -> list:
+    """CPU ids this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def active_transcription_pids() -> list:
+    """PIDs of transcribe.py processes running on this host (just ours without /proc)."""
+    pids = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return [os.getpid()]
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                arguments = f.read().split(b'\0')
+        except OSError:
+            continue
+        if any(os.path.basename(argument) == b'transcribe.py' for argument in arguments[:3]):
+            pids.append(int(entry))
+    if os.getpid() not in pids:
+        pids.append(os.getpid())
+    return sorted(pids)
+
+
+def claim_affinity_slot(max_slots: int):
+    """
+    Claims the lowest free CPU-affinity slot by holding an flock on its slot
+    file for the rest of the process, so the slot frees itself when the
+    process exits. Returns the slot index, or None if pinning is unavailable.
+    """
+    global _affinity_slot
+    if _affinity_slot is not None:
+        return _affinity_slot[0]
+    if fcntl is None or not hasattr(os, 'sched_setaffinity'):
+        return None
+    try:
+        os.makedirs(AFFINITY_SLOT_DIR, exist_ok=True)
+        for index in range(max_slots):
+            slot_file = open(os.path.join(AFFINITY_SLOT_DIR, f"slot_{index}.lock"), 'a')
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            _affinity_slot = (index, slot_file)
+            return index
+    except OSError:
+        pass
+    return None
+
+
+def affinity_slot_rank() -> int:
+    """Position of our claimed slot among the slots live processes hold right now."""
+    rank = 0
+    for index in range(_affinity_slot[0]):
+        path = os.path.join(AFFINITY_SLOT_DIR, f"slot_{index}.lock")
+        if not os.path.exists(path):
+            continue
+        with open(path, 'a') as probe:
+            try:
+                fcntl.flock(probe, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(probe, fcntl.LOCK_UN)
+            except BlockingIOError:
+                rank += 1
+    return rank
+
+
+def set_process_affinity(cores: list):
+    """
+    Applies `cores` to every thread of this process: sched_setaffinity(0)
+    alone only moves the calling thread, not torch's running worker threads.
+    """
+    try:
+        thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, cores)
+        except OSError:
+            pass  # thread exited meanwhile
+
+
+def thread_tuning_host_key() -> str:
+    return f"{platform.node()}:{len(usable_cores())}"
+
+
+def load_thread_tuning() -> dict:
+    """Tuned settings for this host, keyed '<model>@<concurrency>' ({} until tuned)."""
+    try:
+        with open(THREAD_TUNING_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get(thread_tuning_host_key(), {})
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return {}
+
+
+def save_thread_tuning(key: str, setting: dict):
+    """Stores one tuned setting for this host, replacing the file atomically."""
+    try:
+        with open(THREAD_TUNING_FILE, 'r', encoding='utf-8') as f:
+            tuning = json.load(f)
+    except FileNotFoundError:
+        tuning = {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Not updating unreadable thread tuning: {e}", file=sys.stderr)
+        return
+    tuning.setdefault(thread_tuning_host_key(), {})[key] = setting
+    try:
+        os.makedirs(os.path.dirname(THREAD_TUNING_FILE), exist_ok=True)
+        temp_path = f"{THREAD_TUNING_FILE}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(tuning, f, indent=2)
+        os.replace(temp_path, THREAD_TUNING_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save thread tuning: {e}", file=sys.stderr)
+
+
+def pinned_cores(cores: list, concurrency: int, slot: int) -> list:
+    """This job's fair-share slice of `cores`, disjoint from the other slots'."""
+    fair = max(1, len(cores) // concurrency)
+    start = (slot * fair) % len(cores)
+    return [cores[(start + offset) % len(cores)] for offset in range(fair)]
+
+
+def thread_setting_candidates(cores: list, concurrency: int, slot: int = None) -> list:
+    """
+    Settings to benchmark for `concurrency` simultaneous jobs: half, equal
+    and double the fair share of cores, unpinned, plus the fair share pinned
+    to this job's own core slice when `slot` (its rank among the claimed
+    affinity slots) is known.
+    """
+    fair = max(1, len(cores) // concurrency)
+    candidates = [{"threads": threads, "affinity": None}
+                  for threads in sorted({max(1, fair // 2), fair, min(len(cores), fair * 2)})]
+    if slot is not None and concurrency > 1 and hasattr(os, 'sched_setaffinity'):
+        candidates.append({"threads": fair, "affinity": pinned_cores(cores, concurrency, slot)})
+    return candidates
+
+
+def load_runtime_profile() -> dict:
+    """Recommended settings written by `check_env_and_deps.py --profile` ({} if absent)."""
+    try:
+        with open(RUNTIME_PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get("recommended", {})
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return {}
+
+
+def select_model_size(duration: float, latency_target: float = DEFAULT_LATENCY_TARGET_SECONDS,
+                      max_model: str = DEFAULT_MAX_MODEL, parallelism: int = 1) -> dict:
+    """
+    Picks the most accurate Whisper model (up to `max_model`) whose predicted
+    latency for `duration` seconds of audio fits `latency_target` and whose
+    memory footprint fits the memory currently available. Throughput comes
+    from host calibration when present and is scaled by CPU oversubscription.
+    Returns the decision with the inputs it was based on.
+    """
+    host = get_host_resources()
+    calibration = load_calibration()
+    # More runnable work than cores slows every decode roughly proportionally
+    contention = max(1.0, host["load_average"] / host["cpu_count"])
+    available_mb = host["available_memory_mb"]
+
+    candidates = MODEL_PREFERENCE[MODEL_PREFERENCE.index(max_model):]
+    considered = []
+    chosen = None
+    for model_size in candidates:
+        entry = calibration.get(model_size, {})
+        realtime_factor = entry.get("realtime_factor", DEFAULT_REALTIME_FACTORS[model_size])
+        load_seconds = entry.get("load_seconds", DEFAULT_LOAD_SECONDS[model_size])
+        predicted = load_seconds + duration * realtime_factor * contention / max(1, parallelism)
+        memory_needed = MODEL_MEMORY_MB[model_size] * max(1, parallelism)
+        fits_memory = available_mb is None or memory_needed + MEMORY_HEADROOM_MB <= available_mb
+        considered.append({
+            "model": model_size,
+            "predicted_seconds": round(predicted, 2),
+            "memory_mb": memory_needed,
+            "fits_memory": fits_memory,
+            "calibrated": "realtime_factor" in entry
+        })
+        if fits_memory and predicted <= latency_target:
+            chosen = model_size
+            break
+
+    if chosen is None:
+        # Nothing meets the target: take the fastest model that fits in memory
+        chosen = next((c["model"] for c in reversed(considered) if c["fits_memory"]), candidates[-1])
+        reason = "no model meets the latency target; using fastest that fits"
+    elif chosen != candidates[0]:
+        reason = "downgraded for latency or memory pressure"
+    else:
+        reason = "preferred model fits"
+
+    return {
+        "model": chosen,
+        "reason": reason,
+        "audio_duration": round(duration, 2),
+        "latency_target": latency_target,
+        "cpu_contention": round(contention, 2),
+        "host": host,
+        "considered": considered
+    }
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def strip_overlapping_words(previous_text: str, text: str, max_words: int = 8, min_words: int = 1) -> str:
+    """
+    Drops the leading words of `text` that repeat the tail of `previous_text`,
+    when at least `min_words` of them match.
+    """
+    prev_words = [_normalize_word(w) for w in previous_text.split()[-max_words:]]
+    words = text.split()
+    norm_words = [_normalize_word(w) for w in words[:max_words]]
+    for size in range(min(len(prev_words), len(norm_words)), max(0, min_words - 1), -1):
+        if prev_words[-size:] == norm_words[:size] and any(prev_words[-size:]):
+            return ' '.join(words[size:])
+    return text
+
+
 class EnhancedEducationalTranscriber:
     """
     A significantly enhanced transcription system using Whisper, optimized for 
     educational content with perfect Hindi and English recognition.
     """
 
-    def __init__(self, model_size="base"):
+    def __init__(self, model_size="base", cascade_model=None, cascade_thresholds=None, short_context=False,
+                 reuse_buffers=False, autotune=False, concurrency=None):
         """
         Initializes the enhanced transcriber with better model management.
+        With `cascade_model` set, that fast model answers first and `model_size`
+        is only loaded (lazily) when a note needs escalation. With
+        `short_context`, clips up to SHORT_CONTEXT_MAX_SECONDS run the encoder
+        over a reduced audio context. `reuse_buffers` is for resident
+        processes: single-window notes decode through pooled audio/mel buffers
+        and every result reports its allocation and memory deltas. With
+        `autotune`, torch threads (and CPU affinity for separate processes)
+        are benchmarked for the current number of concurrent jobs - an int or
+        callable `concurrency`, else counted from running transcribe.py
+        processes - and re-tuned whenever that number changes.
         """
         self.model_size = model_size
+        self.short_context = short_context
+        self.buffer_pool = None
+        if reuse_buffers:
+            from buffer_pool import BufferPool
+            self.buffer_pool = BufferPool()
+        self.autotune = autotune
+        self.concurrency = concurrency
+        self.thread_setting = None
+        self._request_audio = None  # (filepath, validated probe info) of the request in progress
         self.model = None
+        self.load_time = None
+        self.cascade_model_size = cascade_model
+        self.cascade_model = None
+        self.cascade_thresholds = dict(DEFAULT_CASCADE_THRESHOLDS, **(cascade_thresholds or {}))
+        self.runtime_profile = load_runtime_profile()
         
         # Enhanced educational terms for better context recognition
         self.educational_terms = [
@@ -82,23 +623,15 @@ class EnhancedEducationalTranscriber:
         }
         
         # Enhanced question detection patterns
-        self.question_patterns = [
-            # English patterns
-            r'^\s*(what is|what are|what\'s|whats|explain|define|tell me about|how does|how do|why is|why are|can you explain)\b',
-            r'\b(quiz|test|question|help|help me)\b',
-            r'\?$',
-            
-            # Hindi patterns (Devanagari)
-            r'\b(क्या है|क्या हैं|समझाओ|बताओ|सिखाओ|व्याख्या करो|परिभाषा दो)\b',
-            r'\b(कैसे|क्यों|कहाँ|कब|कौन)\b',
-            r'\b(प्रश्न|सवाल|सहायता|मदद)\b',
-            
-            # Romanized Hindi patterns  
-            r'\b(kya hai|kya hain|samjhao|batao|sikhaao|kaise|kyun|kahan|kab|kaun)\b',
-            r'\b(prashn|sawal|madad|sahayata)\b'
-        ]
+        self.question_patterns = [pattern for _, pattern in QUESTION_INTENT_PATTERNS]
         
-        self.load_enhanced_model()
+        self.apply_runtime_profile()
+        if self.cascade_model_size:
+            self.load_cascade_model()
+        else:
+            self.load_enhanced_model()
+        if self.autotune:
+            self.retune_threads_if_needed()
 
     def load_enhanced_model(self):
         """
@@ -111,6 +644,7 @@ class EnhancedEducationalTranscriber:
             # Try loading the requested model
             self.model = whisper.load_model(self.model_size)
             load_time = time.time() - start_time
+            self.load_time = load_time
             print(f"✅ Enhanced model '{self.model_size}' loaded successfully in {load_time:.2f} seconds.", file=sys.stderr)
             
         except Exception as e:
@@ -125,6 +659,7 @@ class EnhancedEducationalTranscriber:
                         self.model = whisper.load_model(fallback)
                         self.model_size = fallback
                         load_time = time.time() - start_time
+                        self.load_time = load_time
                         print(f"✅ Fallback model '{fallback}' loaded in {load_time:.2f} seconds.", file=sys.stderr)
                         break
                     except Exception as fallback_error:
@@ -133,6 +668,129 @@ class EnhancedEducationalTranscriber:
             else:
                 raise Exception("All model loading attempts failed")
 
+    def apply_runtime_profile(self):
+        """Applies the host-calibrated torch thread count, if a profile exists."""
+        threads = self.runtime_profile.get("threads")
+        if threads:
+            import torch
+            torch.set_num_threads(int(threads))
+            print(f"⚙️ Runtime profile: {threads} torch threads", file=sys.stderr)
+
+    def current_concurrency(self):
+        """
+        (concurrent jobs, this process's rank among claimed affinity slots).
+        The rank is None when jobs share this process or pinning is unavailable.
+        """
+        if callable(self.concurrency):
+            return max(1, int(self.concurrency())), None
+        if self.concurrency:
+            return max(1, int(self.concurrency)), None
+        concurrency = len(active_transcription_pids())
+        if claim_affinity_slot(len(self._all_cores)) is None:
+            return concurrency, None
+        return concurrency, min(affinity_slot_rank(), concurrency - 1)
+
+    def _apply_thread_setting(self, setting: dict):
+        import torch
+        torch.set_num_threads(setting["threads"])
+        try:
+            torch.set_num_interop_threads(1)  # decoding has little inter-op parallelism
+        except RuntimeError:
+            pass  # only settable once per process, before any parallel work
+        if hasattr(os, 'sched_setaffinity') and (setting["affinity"] or _affinity_slot):
+            set_process_affinity(setting["affinity"] or self._all_cores)
+
+    def _benchmark_thread_setting(self, model, setting: dict, mel, options) -> float:
+        """Mean seconds for a short greedy decode of `mel` under `setting`."""
+        self._apply_thread_setting(setting)
+        start = time.perf_counter()
+        for _ in range(AUTOTUNE_RUNS):
+            whisper.decode(model, mel, options)
+        return (time.perf_counter() - start) / AUTOTUNE_RUNS
+
+    def retune_threads_if_needed(self) -> float:
+        """
+        Applies the tuned thread setting for the current concurrency, running
+        the benchmark first if this host has none for this model and level.
+        Returns the seconds spent benchmarking (0.0 when the setting was known).
+        """
+        if not hasattr(self, '_all_cores'):
+            self._all_cores = usable_cores()
+        concurrency, slot = self.current_concurrency()
+        model = self.model or self.cascade_model
+        model_size = self.model_size if self.model else self.cascade_model_size
+        key = f"{model_size}@{concurrency}"
+        if self.thread_setting and self.thread_setting["key"] == key and self.thread_setting["slot"] == slot:
+            return 0.0
+        
+        tuning_start = time.perf_counter()
+        with _THREAD_TUNING_LOCK:
+            setting = load_thread_tuning().get(key)
+            if setting is None:
+                print(f"🧪 Autotuning torch threads for {concurrency} concurrent job(s) on '{model_size}'...",
+                      file=sys.stderr)
+                rng = np.random.default_rng(0)
+                audio = (rng.standard_normal(5 * whisper.audio.SAMPLE_RATE) * 0.05).astype(np.float32)
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+                options = whisper.DecodingOptions(language="en", without_timestamps=True,
+                                                  sample_len=AUTOTUNE_SAMPLE_TOKENS, fp16=False)
+                whisper.decode(model, mel, options)  # one untimed warm-up for all candidates
+                results = []
+                candidates = thread_setting_candidates(self._all_cores, concurrency, slot)
+                for candidate in candidates:
+                    if results and time.perf_counter() - tuning_start > AUTOTUNE_BUDGET_SECONDS:
+                        print(f"   ⏱️ Tuning budget of {AUTOTUNE_BUDGET_SECONDS:.0f}s spent, "
+                              f"skipping {len(candidates) - len(results)} candidate(s)", file=sys.stderr)
+                        break
+                    seconds = self._benchmark_thread_setting(model, candidate, mel, options)
+                    results.append(dict(candidate, seconds=round(seconds, 4)))
+                    print(f"   {candidate['threads']} threads, "
+                          f"{'pinned' if candidate['affinity'] else 'unpinned'}: {seconds:.3f}s", file=sys.stderr)
+                fastest = min(result["seconds"] for result in results)
+                best = min((result for result in results if result["seconds"] <= fastest * (1 + AUTOTUNE_TIE_TOLERANCE)),
+                           key=lambda result: result["threads"])
+                # Pinning is stored as "pinned" and re-sliced per slot when applied
+                setting = {"threads": best["threads"], "pinned": bool(best["affinity"]),
+                           "seconds": best["seconds"], "candidates": [
+                               dict(result, affinity=bool(result["affinity"])) for result in results],
+                           "complete": len(results) == len(candidates),
+                           "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+                save_thread_tuning(key, setting)
+        
+        affinity = None
+        if setting.get("pinned") and slot is not None:
+            affinity = pinned_cores(self._all_cores, concurrency, slot)
+        self._apply_thread_setting({"threads": setting["threads"], "affinity": affinity})
+        self.thread_setting = {"key": key, "slot": slot, "threads": setting["threads"], "affinity": affinity}
+        print(f"⚙️ Thread tuning '{key}': {setting['threads']} torch threads"
+              f"{f', pinned to cores {affinity}' if affinity else ''}", file=sys.stderr)
+        return time.perf_counter() - tuning_start
+
+    def load_cascade_model(self):
+        """Loads the fast first-pass model used by cascade mode."""
+        print(f"🔄 Loading cascade fast model: '{self.cascade_model_size}'...", file=sys.stderr)
+        start_time = time.time()
+        self.cascade_model = whisper.load_model(self.cascade_model_size)
+        print(f"✅ Cascade model '{self.cascade_model_size}' loaded in {time.time() - start_time:.2f} seconds.", file=sys.stderr)
+
+    def ensure_model_loaded(self):
+        """Loads the full model on first use (cascade mode defers it)."""
+        if not self.model:
+            self.load_enhanced_model()
+
+    def validated_audio_info(self, filepath: str) -> dict:
+        """
+        validate_audio() result for `filepath`. Within one transcribe_audio()
+        request the headers are read at most once (or not at all when the
+        caller passed its own probe), however many paths ask for them.
+        """
+        if self._request_audio is None or self._request_audio[0] != filepath:
+            return validate_audio(filepath, max_duration=MAX_AUDIO_SECONDS, min_duration=MIN_AUDIO_SECONDS)
+        if self._request_audio[1] is None:
+            info = validate_audio(filepath, max_duration=MAX_AUDIO_SECONDS, min_duration=MIN_AUDIO_SECONDS)
+            self._request_audio = (filepath, info)
+        return self._request_audio[1]
+
     def enhance_audio_preprocessing(self, filepath: str) -> str:
         """
         Enhanced audio preprocessing for better transcription quality.
@@ -147,7 +805,10 @@ class EnhancedEducationalTranscriber:
         if file_size < 1024:  # Less than 1KB
             raise ValueError(f"Audio file too small ({file_size} bytes): {filepath}")
         
-        print(f"📊 Audio file validated: {file_size} bytes", file=sys.stderr)
+        # Header-only check: corrupt or out-of-range clips never reach ffmpeg
+        info = self.validated_audio_info(filepath)
+        duration = f", {info['duration']:.1f}s" if info["duration"] is not None else ""
+        print(f"📊 Audio file validated: {file_size} bytes, {info['format']}{duration}", file=sys.stderr)
         return filepath
 
     def transcribe_with_enhanced_context(self, filepath: str) -> dict:
@@ -164,29 +825,8 @@ class EnhancedEducationalTranscriber:
             
             transcribe_start = time.time()
             
-            # Enhanced context prompt with both English and Hindi terms
-            context_prompt = (
-                f"This is an educational audio message that may contain technical terms, "
-                f"questions about science, mathematics, computer science, or general academic topics. "
-                f"Common terms include: {', '.join(self.educational_terms[:10])}. "
-                f"The speaker might be asking questions in Hindi or English about learning topics."
-            )
-            
             # Enhanced transcription with optimal parameters
-            result = self.model.transcribe(
-                processed_filepath,
-                fp16=False,  # Better compatibility
-                language=None,  # Let Whisper auto-detect
-                initial_prompt=context_prompt,
-                temperature=0.0,  # Most deterministic output
-                best_of=2,  # Try multiple attempts
-                beam_size=5,  # Better search
-                patience=1.0,  # Allow for pauses
-                condition_on_previous_text=True,  # Use context
-                compression_ratio_threshold=2.4,  # Filter out low-quality segments
-                logprob_threshold=-1.0,  # Filter out uncertain segments
-                no_speech_threshold=0.6  # Better silence detection
-            )
+            result = self.model.transcribe(processed_filepath, **self.build_decode_options())
             
             transcribe_time = time.time() - transcribe_start
             print(f"⏱️ Enhanced transcription completed in {transcribe_time:.2f} seconds.", file=sys.stderr)
@@ -212,6 +852,414 @@ class EnhancedEducationalTranscriber:
             print(f"❌ Enhanced transcription error: {e}", file=sys.stderr)
             return {"error": f"Failed to transcribe audio: {str(e)}"}
 
+    def encode_reduced_context(self, model, audio):
+        """
+        Runs the audio encoder over a mel window sized to `audio` instead of
+        the full 30 s, with the positional embeddings sliced to match.
+        Returns (audio_features, model_view): model_view shares every weight
+        with `model` but reports the reduced n_audio_ctx, so whisper.decode()
+        accepts the features as already encoded.
+        """
+        import torch
+        import torch.nn.functional as F
+        
+        clip_frames = len(audio) // whisper.audio.HOP_LENGTH
+        pad_frames = int(SHORT_CONTEXT_PAD_SECONDS * whisper.audio.FRAMES_PER_SECOND)
+        n_frames = -(-(clip_frames + pad_frames) // SHORT_CONTEXT_STEP_FRAMES) * SHORT_CONTEXT_STEP_FRAMES
+        n_frames = min(n_frames, whisper.audio.N_FRAMES)
+        
+        # Same normalisation as transcribe(): log-mel of the clip followed by 30 s of silence
+        mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=whisper.audio.N_SAMPLES)
+        mel = mel[:, :n_frames].to(model.device).unsqueeze(0)
+        
+        encoder = model.encoder
+        with torch.no_grad():
+            x = F.gelu(encoder.conv1(mel))
+            x = F.gelu(encoder.conv2(x))
+            x = x.permute(0, 2, 1)
+            x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+            for block in encoder.blocks:
+                x = block(x)
+            audio_features = encoder.ln_post(x)
+        
+        model_view = copy.copy(model)
+        model_view.dims = dataclasses.replace(model.dims, n_audio_ctx=audio_features.shape[1])
+        return audio_features, model_view
+
+    def transcribe_short_context(self, filepath: str) -> dict:
+        """
+        Short-utterance path: clips up to SHORT_CONTEXT_MAX_SECONDS are encoded
+        over a reduced audio context and decoded in one window; longer clips
+        fall back to the full-context transcribe_with_enhanced_context().
+        """
+        if not self.model:
+            return {"error": "Enhanced Whisper model is not loaded."}
+        
+        try:
+            # Header probe first, so long clips are not decoded here and again on fallback
+            estimated = estimate_audio_duration(filepath, self.validated_audio_info(filepath))
+            if estimated > SHORT_CONTEXT_MAX_SECONDS:
+                print(f"↔️ {estimated:.1f}s clip exceeds short-context limit, using full context", file=sys.stderr)
+                return self.transcribe_with_enhanced_context(filepath)
+            
+            processed_filepath = self.enhance_audio_preprocessing(filepath)
+            audio = whisper.load_audio(processed_filepath)
+            duration = len(audio) / whisper.audio.SAMPLE_RATE
+            if duration > SHORT_CONTEXT_MAX_SECONDS:
+                # Only when the header estimate was off; the fallback decodes again
+                print(f"↔️ {duration:.1f}s clip exceeds short-context limit, using full context", file=sys.stderr)
+                return self.transcribe_with_enhanced_context(filepath)
+            
+            print(f"🎤 Starting short-context transcription for {processed_filepath}...", file=sys.stderr)
+            transcribe_start = time.time()
+            audio_features, model_view = self.encode_reduced_context(self.model, audio)
+            encode_time = time.time() - transcribe_start
+            raw_text, detected_language, _ = self._decode_window(
+                model_view, audio_features[0], greedy=False, without_timestamps=True
+            )
+            transcribe_time = time.time() - transcribe_start
+            audio_context = {
+                "audio_ctx": model_view.dims.n_audio_ctx,
+                "full_audio_ctx": self.model.dims.n_audio_ctx,
+                "encode_seconds": round(encode_time, 3),
+                "transcribe_seconds": round(transcribe_time, 3)
+            }
+            print(f"⏱️ Short-context transcription completed in {transcribe_time:.2f} seconds "
+                  f"(audio ctx {audio_context['audio_ctx']}/{audio_context['full_audio_ctx']}).", file=sys.stderr)
+            print(f"🌐 Detected language: {detected_language}", file=sys.stderr)
+            
+            if not raw_text:
+                processed = {
+                    "text": "Audio was unclear. Could you please speak again more clearly?",
+                    "is_question": False,
+                    "language": detected_language,
+                    "confidence": "low"
+                }
+            else:
+                processed = self.enhanced_post_process(raw_text, detected_language)
+            processed["audio_context"] = audio_context
+            return processed
+        
+        except Exception as e:
+            print(f"❌ Short-context transcription error: {e}", file=sys.stderr)
+            return {"error": f"Failed to transcribe audio: {str(e)}"}
+
+    def transcribe_with_buffer_pool(self, filepath: str) -> dict:
+        """
+        Resident hot path for notes that fit one 30 s window: audio is decoded
+        into the pool's PCM/float buffers, padded and turned into a log-mel in
+        place, and decoded as a single window. Longer notes use the regular
+        transcribe_with_enhanced_context() path.
+        """
+        from buffer_pool import load_audio_into, log_mel_into
+        
+        if not self.model:
+            return {"error": "Enhanced Whisper model is not loaded."}
+        
+        try:
+            processed_filepath = self.enhance_audio_preprocessing(filepath)
+            expected_seconds = estimate_audio_duration(processed_filepath, self.validated_audio_info(filepath))
+            if expected_seconds > whisper.audio.CHUNK_LENGTH:
+                return self.transcribe_with_enhanced_context(filepath)
+            
+            print(f"🎤 Starting pooled-buffer transcription for {processed_filepath}...", file=sys.stderr)
+            transcribe_start = time.time()
+            audio = load_audio_into(processed_filepath, self.buffer_pool, expected_seconds)
+            if len(audio) > whisper.audio.N_SAMPLES:
+                return self.transcribe_with_enhanced_context(filepath)
+            mel = log_mel_into(audio, self.buffer_pool, self.model.dims.n_mels, whisper.audio.N_SAMPLES,
+                               device=self.model.device)
+            raw_text, detected_language, _ = self._decode_window(self.model, mel, greedy=False)
+            print(f"⏱️ Pooled-buffer transcription completed in {time.time() - transcribe_start:.2f} seconds.",
+                  file=sys.stderr)
+            print(f"🌐 Detected language: {detected_language}", file=sys.stderr)
+            
+            if not raw_text:
+                return {
+                    "text": "Audio was unclear. Could you please speak again more clearly?",
+                    "is_question": False,
+                    "language": detected_language,
+                    "confidence": "low"
+                }
+            return self.enhanced_post_process(raw_text, detected_language)
+        
+        except Exception as e:
+            print(f"❌ Pooled-buffer transcription error: {e}", file=sys.stderr)
+            return {"error": f"Failed to transcribe audio: {str(e)}"}
+
+    def build_decode_options(self, prompt_terms: int = 10, **overrides) -> dict:
+        """
+        Whisper decoding options shared by the single-pass and long-audio paths.
+        `prompt_terms` educational terms go into the context prompt (0 = no
+        prompt); keyword overrides replace individual options.
+        """
+        # Enhanced context prompt with both English and Hindi terms
+        context_prompt = (
+            f"This is an educational audio message that may contain technical terms, "
+            f"questions about science, mathematics, computer science, or general academic topics. "
+            f"Common terms include: {', '.join(self.educational_terms[:prompt_terms])}. "
+            f"The speaker might be asking questions in Hindi or English about learning topics."
+        ) if prompt_terms > 0 else None
+        
+        options = {
+            "fp16": False,  # Better compatibility
+            "language": None,  # Let Whisper auto-detect
+            "initial_prompt": context_prompt,
+            "temperature": 0.0,  # Most deterministic output
+            "best_of": 2,  # Try multiple attempts
+            "beam_size": 5,  # Better search
+            "patience": 1.0,  # Allow for pauses
+            "condition_on_previous_text": True,  # Use context
+            "compression_ratio_threshold": 2.4,  # Filter out low-quality segments
+            "logprob_threshold": -1.0,  # Filter out uncertain segments
+            "no_speech_threshold": 0.6  # Better silence detection
+        }
+        options.update(overrides)
+        return options
+
+    def transcribe_long_audio(self, filepath: str, max_workers: int = None) -> dict:
+        """
+        Long-audio transcription: cuts the recording at low-energy points into
+        ~30 s chunks with small overlaps, transcribes the chunks across a process
+        pool and stitches the segments back together before post-processing.
+        """
+        if not self.model:
+            return {"error": "Enhanced Whisper model is not loaded."}
+        
+        try:
+            processed_filepath = self.enhance_audio_preprocessing(filepath)
+            sample_rate = whisper.audio.SAMPLE_RATE
+            audio = whisper.load_audio(processed_filepath)
+            duration = len(audio) / sample_rate
+            
+            cuts = find_low_energy_cuts(audio, sample_rate)
+            overlap = int(LONG_AUDIO_OVERLAP_SECONDS * sample_rate)
+            decode_options = self.build_decode_options()
+            
+            jobs = []
+            chunk_bounds = []
+            for index, (core_start, core_end) in enumerate(zip(cuts[:-1], cuts[1:])):
+                start = max(0, core_start - overlap)
+                end = min(len(audio), core_end + overlap)
+                jobs.append((index, audio[start:end], decode_options))
+                chunk_bounds.append((start, core_start, core_end))
+            
+            cpu_count = os.cpu_count() or 1
+            if max_workers is None:
+                max_workers = int(os.environ.get("TRANSCRIBE_WORKERS",
+                                                 self.runtime_profile.get("workers", min(4, cpu_count))))
+            max_workers = max(1, min(max_workers, len(jobs)))
+            threads_per_worker = max(1, cpu_count // max_workers)
+            
+            print(f"🧩 Long-audio mode: {duration:.1f}s split into {len(jobs)} chunks "
+                  f"across {max_workers} workers", file=sys.stderr)
+            transcribe_start = time.time()
+            
+            if max_workers == 1:
+                results = [(job[0], self.model.transcribe(job[1], **decode_options)) for job in jobs]
+            else:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                         initializer=_init_chunk_worker,
+                                         initargs=(self.model_size, threads_per_worker)) as pool:
+                    results = list(pool.map(_transcribe_chunk, jobs))
+            
+            transcribe_time = time.time() - transcribe_start
+            print(f"⏱️ Chunked transcription completed in {transcribe_time:.2f} seconds.", file=sys.stderr)
+            
+            segments, detected_language = self.stitch_chunk_results(results, chunk_bounds, sample_rate)
+            raw_text = ' '.join(segment["text"] for segment in segments).strip()
+            
+            print(f"🌐 Detected language: {detected_language}", file=sys.stderr)
+            print(f"📝 Raw transcription: '{raw_text[:100]}{'...' if len(raw_text) > 100 else ''}'", file=sys.stderr)
+            
+            if not raw_text:
+                return {
+                    "text": "Audio was unclear. Could you please speak again more clearly?",
+                    "is_question": False,
+                    "language": detected_language,
+                    "confidence": "low"
+                }
+            
+            result = self.enhanced_post_process(raw_text, detected_language)
+            result["segments"] = segments
+            result["duration"] = round(duration, 2)
+            result["chunks"] = len(jobs)
+            return result
+
+        except Exception as e:
+            print(f"❌ Long-audio transcription error: {e}", file=sys.stderr)
+            return {"error": f"Failed to transcribe audio: {str(e)}"}
+
+    def _decode_window(self, model, mel, greedy: bool, without_timestamps: bool = False):
+        """
+        Single-window decode on a precomputed log-mel (or encoder output),
+        mirroring the options of build_decode_options(). Returns
+        (text, language, signals).
+        """
+        options = self.build_decode_options()
+        decoding_options = whisper.DecodingOptions(
+            task="transcribe",
+            language=options["language"],
+            prompt=options["initial_prompt"],
+            temperature=options["temperature"],
+            beam_size=None if greedy else options["beam_size"],
+            patience=None if greedy else options["patience"],
+            without_timestamps=without_timestamps,
+            fp16=options["fp16"]
+        )
+        result = whisper.decode(model, mel, decoding_options)
+        signals = {
+            "avg_logprob": result.avg_logprob,
+            "no_speech_prob": result.no_speech_prob,
+            "compression_ratio": result.compression_ratio
+        }
+        text = result.text.strip()
+        # Same silence rule transcribe() applies to segments
+        if result.no_speech_prob > options["no_speech_threshold"] and result.avg_logprob < options["logprob_threshold"]:
+            text = ""
+        return text, result.language, signals
+
+    def _transcribe_signals(self, result: dict) -> dict:
+        """Length-weighted decode signals across the segments of a transcribe() result."""
+        segments = result.get("segments", [])
+        if not segments:
+            return {"avg_logprob": -10.0, "no_speech_prob": 1.0, "compression_ratio": 0.0}
+        weights = [max(segment["end"] - segment["start"], 0.01) for segment in segments]
+        total = sum(weights)
+        return {
+            "avg_logprob": sum(s["avg_logprob"] * w for s, w in zip(segments, weights)) / total,
+            "no_speech_prob": sum(s["no_speech_prob"] * w for s, w in zip(segments, weights)) / total,
+            "compression_ratio": max(s["compression_ratio"] for s in segments)
+        }
+
+    def escalation_reasons(self, signals: dict, confidence: str) -> list:
+        """Which cascade thresholds a first-pass result fails (empty list = accept)."""
+        thresholds = self.cascade_thresholds
+        reasons = []
+        if signals["avg_logprob"] < thresholds["min_avg_logprob"]:
+            reasons.append("avg_logprob")
+        if signals["no_speech_prob"] > thresholds["max_no_speech_prob"]:
+            reasons.append("no_speech_prob")
+        if signals["compression_ratio"] > thresholds["max_compression_ratio"]:
+            reasons.append("compression_ratio")
+        if CONFIDENCE_RANK.get(confidence, 0) < CONFIDENCE_RANK[thresholds["min_confidence"]]:
+            reasons.append("confidence")
+        return reasons
+
+    def transcribe_cascade(self, filepath: str) -> dict:
+        """
+        Two-pass cascade: a greedy decode on the fast model answers unless its
+        log-probability, no-speech probability, compression ratio or
+        calculate_confidence() score falls outside the thresholds; only then is
+        the full model run. Audio is decoded once, and for clips that fit one
+        30 s window the log-mel is computed once and shared by both passes.
+        """
+        if not self.cascade_model:
+            return {"error": "Cascade fast model is not loaded."}
+        
+        try:
+            processed_filepath = self.enhance_audio_preprocessing(filepath)
+            audio = whisper.load_audio(processed_filepath)
+            single_window = len(audio) <= whisper.audio.N_SAMPLES
+            mel = None
+            if single_window:
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.cascade_model.dims.n_mels)
+                mel = mel.to(self.cascade_model.device)
+            
+            # Pass 1: fast greedy decode
+            print(f"🏎️ Cascade pass 1 on '{self.cascade_model_size}'...", file=sys.stderr)
+            fast_start = time.time()
+            if single_window:
+                raw_text, detected_language, signals = self._decode_window(self.cascade_model, mel, greedy=True)
+            else:
+                options = self.build_decode_options(beam_size=None, best_of=None, patience=None)
+                result = self.cascade_model.transcribe(audio, **options)
+                raw_text, detected_language = result["text"].strip(), result.get("language", "unknown")
+                signals = self._transcribe_signals(result)
+            fast_time = time.time() - fast_start
+            
+            processed = self.enhanced_post_process(raw_text, detected_language) if raw_text else None
+            confidence = processed["confidence"] if processed else "low"
+            reasons = self.escalation_reasons(signals, confidence)
+            cascade_info = {
+                "tier": "fast",
+                "fast_model": self.cascade_model_size,
+                "full_model": self.model_size,
+                "escalated": bool(reasons),
+                "reasons": reasons,
+                "fast_signals": {name: round(value, 3) for name, value in signals.items()},
+                "fast_seconds": round(fast_time, 2)
+            }
+            print(f"⏱️ Pass 1 in {fast_time:.2f}s, escalation reasons: {reasons or 'none'}", file=sys.stderr)
+            
+            # Pass 2: full model, only when the fast result is doubtful
+            if reasons:
+                self.ensure_model_loaded()
+                print(f"🎤 Cascade pass 2 on '{self.model_size}'...", file=sys.stderr)
+                full_start = time.time()
+                if single_window:
+                    if self.model.dims.n_mels != self.cascade_model.dims.n_mels:
+                        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), self.model.dims.n_mels)
+                    raw_text, detected_language, _ = self._decode_window(self.model, mel.to(self.model.device), greedy=False)
+                else:
+                    result = self.model.transcribe(audio, **self.build_decode_options())
+                    raw_text, detected_language = result["text"].strip(), result.get("language", "unknown")
+                cascade_info["tier"] = "full"
+                cascade_info["full_seconds"] = round(time.time() - full_start, 2)
+                processed = self.enhanced_post_process(raw_text, detected_language) if raw_text else None
+            
+            print(f"🌐 Detected language: {detected_language}", file=sys.stderr)
+            if not processed:
+                processed = {
+                    "text": "Audio was unclear. Could you please speak again more clearly?",
+                    "is_question": False,
+                    "language": detected_language,
+                    "confidence": "low"
+                }
+            processed["model_used"] = self.model_size if cascade_info["tier"] == "full" else self.cascade_model_size
+            processed["cascade"] = cascade_info
+            return processed
+
+        except Exception as e:
+            print(f"❌ Cascade transcription error: {e}", file=sys.stderr)
+            return {"error": f"Failed to transcribe audio: {str(e)}"}
+
+    def stitch_chunk_results(self, results: list, chunk_bounds: list, sample_rate: int):
+        """
+        Merges per-chunk Whisper results in order. Segment timestamps are shifted
+        to the full recording, segments whose midpoint falls in a neighbour's
+        overlap are dropped, and words repeated across the seam are removed.
+        Returns the merged segments and the duration-weighted majority language.
+        """
+        segments = []
+        language_seconds = Counter()
+        for index, result in sorted(results, key=lambda item: item[0]):
+            chunk_start, core_start, core_end = chunk_bounds[index]
+            offset = chunk_start / sample_rate
+            core_from, core_to = core_start / sample_rate, core_end / sample_rate
+            language_seconds[result.get("language", "unknown")] += core_to - core_from
+            
+            kept_in_chunk = False
+            for segment in result.get("segments", []):
+                start = segment["start"] + offset
+                end = segment["end"] + offset
+                if not core_from <= (start + end) / 2 < core_to:
+                    continue
+                text = segment["text"].strip()
+                if segments and not kept_in_chunk:
+                    # Words can only repeat across the seam with the previous chunk; a
+                    # single matching word is only trusted if the segments overlap in time
+                    overlaps = start < segments[-1]["end"]
+                    text = strip_overlapping_words(segments[-1]["text"], text, min_words=1 if overlaps else 2)
+                if not text:
+                    continue
+                segments.append({"start": round(start, 2), "end": round(end, 2), "text": text})
+                kept_in_chunk = True
+        
+        detected_language = language_seconds.most_common(1)[0][0] if language_seconds else "unknown"
+        return segments, detected_language
+
     def enhanced_post_process(self, text: str, detected_language: str = "unknown") -> dict:
         """
         Enhanced post-processing with better Hindi/English recognition and cleaning.
@@ -380,25 +1428,10 @@ class EnhancedEducationalTranscriber:
 
     def detect_question_intent(self, text: str) -> bool:
         """Enhanced question detection with better pattern matching."""
-        
-        # Check all question patterns
-        for pattern in self.question_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                print(f"🎯 Question pattern matched: {pattern}", file=sys.stderr)
-                return True
-        
-        # Additional heuristics
-        question_indicators = [
-            text.strip().endswith('?'),
-            len(text.split()) >= 2 and text.split()[0].lower() in ['what', 'how', 'why', 'when', 'where', 'which', 'who'],
-            'explain' in text.lower(),
-            'tell me' in text.lower(),
-            'teach me' in text.lower(),
-            'क्या' in text or 'कैसे' in text or 'क्यों' in text,
-            'samjhao' in text.lower() or 'batao' in text.lower()
-        ]
-        
-        return any(question_indicators)
+        intent = classify_question_intent(text)
+        if intent not in ('heuristic', 'statement'):
+            print(f"🎯 Question pattern matched: {intent}", file=sys.stderr)
+        return intent != 'statement'
 
     def calculate_confidence(self, text: str, detected_language: str) -> str:
         """Calculate confidence level of transcription."""
@@ -451,32 +1484,121 @@ class EnhancedEducationalTranscriber:
         
         return text
 
-    def transcribe_audio(self, filepath: str) -> dict:
-        """Main transcription method with enhanced processing."""
+    def transcribe_audio(self, filepath: str, long_audio: bool = False, audio_info: dict = None) -> dict:
+        """
+        Main transcription method with enhanced processing. `audio_info` is the
+        caller's validate_audio() result for `filepath`, so it is not probed again.
+        """
+        tuning_seconds = self.retune_threads_if_needed() if self.autotune else 0.0
+        self._request_audio = (filepath, audio_info)
+        try:
+            if not self.buffer_pool:
+                result = self._dispatch_transcription(filepath, long_audio)
+            else:
+                from buffer_pool import AllocationMeter
+                with AllocationMeter(self.buffer_pool) as meter:
+                    result = self._dispatch_transcription(filepath, long_audio)
+                result["memory"] = meter.report
+        finally:
+            self._request_audio = None
+        if tuning_seconds:
+            # Reported so callers keep benchmark time out of throughput calibration
+            result["thread_tuning_seconds"] = round(tuning_seconds, 3)
+        return result
+
+    def _dispatch_transcription(self, filepath: str, long_audio: bool) -> dict:
+        if self.cascade_model and not long_audio:
+            return self.transcribe_cascade(filepath)
+        self.ensure_model_loaded()
+        if long_audio:
+            return self.transcribe_long_audio(filepath)
+        if self.short_context:
+            return self.transcribe_short_context(filepath)
+        if self.buffer_pool:
+            return self.transcribe_with_buffer_pool(filepath)
         return self.transcribe_with_enhanced_context(filepath)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Enhanced educational transcription")
+    parser.add_argument("audio_file_path", nargs="?")
+    parser.add_argument("--long", dest="long_audio", action="store_true",
+                        help="Force long-audio mode (parallel chunked transcription)")
+    parser.add_argument("--model", default=os.environ.get("TRANSCRIBE_MODEL"),
+                        help="Whisper model size, overriding automatic selection (e.g. 'tiny')")
+    parser.add_argument("--cascade", action="store_true", default=os.environ.get("TRANSCRIBE_CASCADE") == "1",
+                        help="Answer from a fast greedy pass and escalate only uncertain notes")
+    parser.add_argument("--cascade-model", default=CASCADE_FAST_MODEL, help="Fast first-pass model for --cascade")
+    parser.add_argument("--cascade-thresholds", type=json.loads, default=None,
+                        help='JSON overrides, e.g. \'{"min_avg_logprob": -0.6, "min_confidence": "low"}\'')
+    parser.add_argument("--latency-target", type=float,
+                        default=float(os.environ.get("TRANSCRIBE_LATENCY_TARGET", DEFAULT_LATENCY_TARGET_SECONDS)),
+                        help="Seconds the automatic model selection aims to finish within")
+    parser.add_argument("--short-context", action="store_true",
+                        default=os.environ.get("TRANSCRIBE_SHORT_CONTEXT") == "1",
+                        help=f"Encode clips up to {SHORT_CONTEXT_MAX_SECONDS:.0f}s over a reduced audio context")
+    parser.add_argument("--autotune", action="store_true", default=os.environ.get("TRANSCRIBE_AUTOTUNE") == "1",
+                        help="Benchmark and apply torch thread/affinity settings for the current concurrency")
+    parser.add_argument("--profile", action="store_true",
+                        help="Write cProfile/collapsed-stack/tracemalloc artifacts next to the audio file")
+    parser.add_argument("--profile-mode", choices=["full", "sample"],
+                        help="Profilers for --profile (default 'full'; 'sample' skips cProfile); implies --profile")
+    args = parser.parse_args()
+    # Neither flag leaves the choice to $REQUEST_PROFILE
+    profile_mode = args.profile_mode or ("full" if args.profile else REQUEST_PROFILE_MODE)
+
+    if not args.audio_file_path:
         error_result = {
             "error": "No audio file path provided.",
-            "usage": "python transcribe.py <audio_file_path>",
+            "usage": "python transcribe.py <audio_file_path> [--long] [--model SIZE]",
             "supported_formats": ["wav", "mp3", "m4a", "ogg", "flac"]
         }
         print(json.dumps(error_result, indent=2))
         sys.exit(1)
     
-    audio_file_path = sys.argv[1]
+    audio_file_path = args.audio_file_path
     
     print(f"🚀 Starting enhanced educational transcription...", file=sys.stderr)
     print(f"📁 Input file: {audio_file_path}", file=sys.stderr)
     
+    # Reject empty, corrupt or over-long notes from their headers alone
+    try:
+        audio_info = validate_audio(audio_file_path, max_duration=MAX_AUDIO_SECONDS,
+                                    min_duration=MIN_AUDIO_SECONDS)
+    except (OSError, AudioProbeError) as probe_error:
+        print(f"❌ Audio rejected: {probe_error}", file=sys.stderr)
+        print(json.dumps({"error": f"Could not process this voice note: {probe_error}", "rejected": True},
+                         indent=2, ensure_ascii=False))
+        sys.exit(0)
+    
     # Initialize the enhanced transcriber with optimal model
     try:
-        # Try to use 'small' model for better accuracy, fallback to 'base'
-        preferred_model = "small" if os.path.getsize(audio_file_path) < 5 * 1024 * 1024 else "base"  # 5MB threshold
-        transcriber = EnhancedEducationalTranscriber(model_size=preferred_model)
-        print(f"✅ Enhanced transcriber initialized with '{transcriber.model_size}' model", file=sys.stderr)
+        # Pick the model from real audio duration and current host capacity
+        audio_duration = estimate_audio_duration(audio_file_path, audio_info)
+        is_long_audio = args.long_audio or audio_duration >= LONG_AUDIO_THRESHOLD_SECONDS
+        if args.model:
+            model_selection = {"model": args.model, "reason": "forced", "audio_duration": round(audio_duration, 2)}
+        else:
+            parallelism = min(4, os.cpu_count() or 1) if is_long_audio else 1
+            max_model = load_runtime_profile().get("model_size", DEFAULT_MAX_MODEL)
+            # Profiles written before the ceiling existed may still say 'medium'
+            if MODEL_PREFERENCE.index(max_model) < MODEL_PREFERENCE.index(DEFAULT_MAX_MODEL):
+                max_model = DEFAULT_MAX_MODEL
+            model_selection = select_model_size(audio_duration, args.latency_target,
+                                                max_model=max_model, parallelism=parallelism)
+        preferred_model = model_selection["model"]
+        print(f"🧮 Model selection: '{preferred_model}' for {audio_duration:.1f}s audio "
+              f"({model_selection['reason']})", file=sys.stderr)
+        use_cascade = args.cascade and not is_long_audio and preferred_model != args.cascade_model
+        transcriber = EnhancedEducationalTranscriber(
+            model_size=preferred_model,
+            cascade_model=args.cascade_model if use_cascade else None,
+            cascade_thresholds=args.cascade_thresholds,
+            short_context=args.short_context,
+            autotune=args.autotune
+        )
+        print(f"✅ Enhanced transcriber initialized with '{transcriber.model_size}' model"
+              f"{f' (cascade from {args.cascade_model!r})' if use_cascade else ''}", file=sys.stderr)
         
     except Exception as init_error:
         print(f"❌ Failed to initialize enhanced transcriber: {init_error}", file=sys.stderr)
@@ -486,12 +1608,22 @@ if __name__ == "__main__":
     
     # Perform enhanced transcription
     start_time = time.time()
-    transcription_result = transcriber.transcribe_audio(audio_file_path)
+    with request_profile("transcribe", artifact_base=audio_file_path, mode=profile_mode) as profile:
+        transcription_result = transcriber.transcribe_audio(audio_file_path, long_audio=is_long_audio,
+                                                            audio_info=audio_info)
     total_time = time.time() - start_time
+    if profile:
+        transcription_result["profile_artifacts"] = profile.artifacts
     
     # Add timing information
     transcription_result["processing_time"] = round(total_time, 2)
-    transcription_result["model_used"] = transcriber.model_size
+    transcription_result.setdefault("model_used", transcriber.model_size)
+    transcription_result["model_selection"] = model_selection
+    transcription_result["audio_info"] = audio_info
+    
+    if "error" not in transcription_result and not is_long_audio and not use_cascade:
+        transcribe_seconds = total_time - transcription_result.get("thread_tuning_seconds", 0.0)
+        record_calibration(transcriber.model_size, audio_duration, transcribe_seconds, transcriber.load_time)
     
     print(f"⏱️ Total enhanced processing time: {total_time:.2f} seconds", file=sys.stderr)
     print(f"🎯 Final result: {transcription_result.get('text', 'No text')[:50]}...", file=sys.stderr)
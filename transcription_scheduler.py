@@ -0,0 +1,362 @@
+# transcription_scheduler.py - Priority & Deadline Scheduling for Voice Note Transcription
+import sys
+import os
+import time
+import json
+import uuid
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from audio_probe import AudioProbeError, validate_audio
+from buffer_pool import current_rss_bytes
+from transcribe import (EnhancedEducationalTranscriber, estimate_audio_duration,
+                        DEFAULT_REALTIME_FACTORS, MAX_AUDIO_SECONDS, MIN_AUDIO_SECONDS, load_calibration)
+
+MODEL_LOAD_OVERHEAD_SECONDS = 2.0  # charged until a worker has the model resident
+DEFAULT_DEADLINE_SECONDS = 90.0  # index.js kills transcribe.py after 90 s
+
+
+class TranscriptionJob:
+    """A queued transcription request and its scheduling metadata."""
+
+    def __init__(self, filepath, duration, deadline, model_size, job_id=None, audio_info=None):
+        self.job_id = job_id or str(uuid.uuid4())[:8]
+        self.filepath = filepath
+        self.audio_info = audio_info  # header probe from submit(), reused by the worker
+        self.duration = duration
+        self.submitted_at = time.time()
+        self.deadline = self.submitted_at + deadline
+        self.model_size = model_size
+        self.estimated_cost = 0.0
+        self.downgraded = False
+        self.future = Future()
+
+
+class TranscriptionScheduler:
+    """
+    Schedules transcription jobs in front of EnhancedEducationalTranscriber.
+    Jobs are ordered shortest-job-first on estimated decode cost, with an aging
+    credit so long recordings are not starved, and jobs close to their deadline
+    jump the queue. Work that cannot finish in time is downgraded to a faster
+    model or rejected, both up front and again when it reaches a worker.
+    """
+
+    def __init__(self, model_size="small", fallback_model="tiny", workers=1,
+                 aging_rate=0.5, urgent_slack=5.0, autotune=False):
+        self.model_size = model_size
+        self.autotune = autotune
+        self.fallback_model = fallback_model
+        self.workers = max(1, workers)
+        self.aging_rate = aging_rate
+        self.urgent_slack = urgent_slack
+        # Seeded from host calibration, then refined from observed jobs
+        self.realtime_factors = dict(DEFAULT_REALTIME_FACTORS)
+        for model, entry in load_calibration().items():
+            if "realtime_factor" in entry:
+                self.realtime_factors[model] = entry["realtime_factor"]
+
+        self._loaded_models = set()
+        self._queue = []
+        self._running = {}  # keyed by id(job): client-supplied job ids may repeat (retries)
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._stopped = False
+
+        self._wait_times = deque(maxlen=1000)
+        self._rss_after_job = deque(maxlen=1000)
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0, "invalid": 0,
+                          "downgraded": 0, "expired": 0, "missed_deadline": 0}
+
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"transcribe-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def estimate_cost(self, duration: float, model_size: str) -> float:
+        """
+        Estimated wall time in seconds to transcribe `duration` seconds of
+        audio, including the model load if no worker has loaded it yet.
+        """
+        factor = self.realtime_factors.get(model_size, DEFAULT_REALTIME_FACTORS['small'])
+        load = MODEL_LOAD_OVERHEAD_SECONDS if model_size not in self._loaded_models else 0.0
+        return load + duration * factor
+
+    def _backlog_seconds(self, cost: float = None) -> float:
+        """
+        Estimated seconds until a worker frees up for a job of the given cost:
+        running work plus queued jobs that shortest-job-first would run first.
+        """
+        now = time.time()
+        ahead = [job for job in self._queue
+                 if cost is None or job.estimated_cost - self.aging_rate * (now - job.submitted_at) <= cost]
+        queued = sum(job.estimated_cost for job in ahead)
+        running = sum(max(0.0, job.estimated_cost - (now - started)) for job, started in self._running.values())
+        return (queued + running) / self.workers
+
+    def submit(self, filepath: str, deadline: float = DEFAULT_DEADLINE_SECONDS, job_id: str = None) -> Future:
+        """
+        Queues a transcription job. Returns a Future resolving to the
+        transcription result dict (or an error dict if the job was rejected).
+        """
+        try:
+            audio_info = validate_audio(filepath, max_duration=MAX_AUDIO_SECONDS, min_duration=MIN_AUDIO_SECONDS)
+        except (OSError, AudioProbeError) as e:
+            # Bad files are answered immediately and never take a queue slot
+            with self._lock:
+                self._counters["submitted"] += 1
+                self._counters["invalid"] += 1
+            future = Future()
+            future.set_result({"error": f"Could not process this voice note: {e}", "rejected": True,
+                               "job_id": job_id})
+            return future
+
+        duration = estimate_audio_duration(filepath, audio_info)
+        job = TranscriptionJob(filepath, duration, deadline, self.model_size, job_id, audio_info)
+
+        with self._lock:
+            self._counters["submitted"] += 1
+            job.estimated_cost = self.estimate_cost(duration, job.model_size)
+            backlog = self._backlog_seconds(job.estimated_cost)
+
+            if backlog + job.estimated_cost > deadline and self.fallback_model != job.model_size:
+                fallback_cost = self.estimate_cost(duration, self.fallback_model)
+                fallback_backlog = self._backlog_seconds(fallback_cost)
+                if fallback_backlog + fallback_cost <= deadline:
+                    print(f"⬇️ Job {job.job_id}: downgrading '{job.model_size}' -> '{self.fallback_model}' "
+                          f"to meet {deadline:.0f}s deadline", file=sys.stderr)
+                    job.model_size = self.fallback_model
+                    job.estimated_cost = fallback_cost
+                    job.downgraded = True
+                    backlog = fallback_backlog
+                    self._counters["downgraded"] += 1
+
+            if backlog + job.estimated_cost > deadline:
+                self._counters["rejected"] += 1
+                print(f"🚫 Job {job.job_id}: rejected, estimated {backlog + job.estimated_cost:.1f}s "
+                      f"exceeds {deadline:.0f}s deadline", file=sys.stderr)
+                job.future.set_result({
+                    "error": "Transcription queue is full. Please try again shortly.",
+                    "rejected": True,
+                    "job_id": job.job_id,
+                    "estimated_seconds": round(backlog + job.estimated_cost, 2)
+                })
+                return job.future
+
+            self._queue.append(job)
+            self._not_empty.notify()
+
+        print(f"📥 Job {job.job_id}: queued ({duration:.1f}s audio, ~{job.estimated_cost:.1f}s on "
+              f"'{job.model_size}', depth {len(self._queue)})", file=sys.stderr)
+        return job.future
+
+    def _expire_infeasible_jobs(self, now: float):
+        """
+        Answers queued jobs that can no longer finish before their deadline
+        with a timeout instead of spending a worker on them, unless the
+        fallback model would still make it.
+        """
+        for job in list(self._queue):
+            if now + job.estimated_cost <= job.deadline:
+                continue
+            if job.model_size != self.fallback_model:
+                fallback_cost = self.estimate_cost(job.duration, self.fallback_model)
+                if now + fallback_cost <= job.deadline:
+                    print(f"⬇️ Job {job.job_id}: downgrading '{job.model_size}' -> '{self.fallback_model}' "
+                          f"after waiting {now - job.submitted_at:.1f}s", file=sys.stderr)
+                    job.model_size = self.fallback_model
+                    job.estimated_cost = fallback_cost
+                    job.downgraded = True
+                    self._counters["downgraded"] += 1
+                    continue
+            self._queue.remove(job)
+            self._counters["expired"] += 1
+            print(f"⌛ Job {job.job_id}: expired after {now - job.submitted_at:.1f}s in queue, "
+                  f"~{job.estimated_cost:.1f}s of work would miss its deadline", file=sys.stderr)
+            job.future.set_result({
+                "error": "Transcription took too long to start. Please try again shortly.",
+                "rejected": True,
+                "timed_out": True,
+                "job_id": job.job_id,
+                "scheduler": {"wait_time": round(now - job.submitted_at, 2)}
+            })
+
+    def _next_job(self):
+        """
+        Picks the next job: most urgent deadline first, else shortest aged
+        cost. Returns None if every queued job had to be expired.
+        """
+        now = time.time()
+        self._expire_infeasible_jobs(now)
+        if not self._queue:
+            return None
+        urgent = [job for job in self._queue if job.deadline - now - job.estimated_cost < self.urgent_slack]
+        if urgent:
+            job = min(urgent, key=lambda j: j.deadline)
+        else:
+            job = min(self._queue, key=lambda j: j.estimated_cost - self.aging_rate * (now - j.submitted_at))
+        self._queue.remove(job)
+        return job
+
+    def _worker_loop(self):
+        transcribers = {}
+        while True:
+            with self._not_empty:
+                job = None
+                while job is None:
+                    while not self._queue and not self._stopped:
+                        self._not_empty.wait()
+                    if self._stopped and not self._queue:
+                        return
+                    job = self._next_job()
+                started = time.time()
+                self._running[id(job)] = (job, started)
+                self._wait_times.append(started - job.submitted_at)
+
+            transcribe_seconds = 0.0
+            try:
+                if job.model_size not in transcribers:
+                    # Jobs share this process, so autotuning follows the number running right now
+                    transcribers[job.model_size] = EnhancedEducationalTranscriber(
+                        model_size=job.model_size, reuse_buffers=True, autotune=self.autotune,
+                        concurrency=lambda: len(self._running)
+                    )
+                    with self._lock:
+                        self._loaded_models.add(job.model_size)
+                # Only the transcription is timed for the EMA; model loads are
+                # estimated separately by estimate_cost()
+                transcribe_start = time.time()
+                result = transcribers[job.model_size].transcribe_audio(job.filepath, audio_info=job.audio_info)
+                transcribe_seconds = time.time() - transcribe_start
+            except Exception as e:
+                print(f"❌ Job {job.job_id} failed: {e}", file=sys.stderr)
+                result = {"error": f"Failed to transcribe audio: {str(e)}"}
+
+            finished = time.time()
+            elapsed = finished - started
+            with self._lock:
+                del self._running[id(job)]
+                self._counters["completed"] += 1
+                if finished > job.deadline:
+                    self._counters["missed_deadline"] += 1
+                rss = current_rss_bytes()
+                if rss is not None:
+                    self._rss_after_job.append(rss)
+                if job.duration > 0 and "error" not in result:
+                    observed = (transcribe_seconds - result.get("thread_tuning_seconds", 0.0)) / job.duration
+                    previous = self.realtime_factors.get(job.model_size, observed)
+                    self.realtime_factors[job.model_size] = 0.8 * previous + 0.2 * observed
+
+            result["job_id"] = job.job_id
+            result["model_used"] = job.model_size
+            result["scheduler"] = {
+                "wait_time": round(started - job.submitted_at, 2),
+                "processing_time": round(elapsed, 2),
+                "estimated_duration": round(job.duration, 2),
+                "downgraded": job.downgraded
+            }
+            job.future.set_result(result)
+
+    def stats(self) -> dict:
+        """Queue depth, counters and wait-time statistics over recent jobs."""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            stats = dict(self._counters)
+            stats["queue_depth"] = len(self._queue)
+            stats["running"] = len(self._running)
+            stats["backlog_seconds"] = round(self._backlog_seconds(), 2)
+            stats["realtime_factors"] = {model: round(factor, 3) for model, factor in self.realtime_factors.items()}
+            rss_window = list(self._rss_after_job)
+
+        # Resident memory after each recent job; growth should stay near zero in steady state
+        if rss_window:
+            mb = 1024 * 1024
+            stats["memory"] = {
+                "rss_mb": round(rss_window[-1] / mb, 1),
+                "rss_growth_mb": round((rss_window[-1] - rss_window[0]) / mb, 1),
+                "jobs_in_window": len(rss_window)
+            }
+
+        if waits:
+            stats["wait_time"] = {
+                "mean": round(sum(waits) / len(waits), 2),
+                "p50": round(waits[len(waits) // 2], 2),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2),
+                "max": round(waits[-1], 2)
+            }
+        else:
+            stats["wait_time"] = {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return stats
+
+    def shutdown(self, wait=True):
+        """Stops accepting work; workers drain the queue and exit."""
+        with self._not_empty:
+            self._stopped = True
+            self._not_empty.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def serve(scheduler: TranscriptionScheduler):
+    """
+    Long-running mode: reads one JSON request per stdin line and writes one
+    JSON result per stdout line, in completion order.
+      {"id": "abc", "path": "voice.mp3", "deadline": 90}
+      {"cmd": "stats"}
+    """
+    output_lock = threading.Lock()
+
+    def emit(payload):
+        with output_lock:
+            print(json.dumps(payload, ensure_ascii=False), flush=True)
+
+    print("🟢 Transcription scheduler ready", file=sys.stderr)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            emit({"error": f"Invalid request: {e}"})
+            continue
+
+        if not isinstance(request, dict):
+            emit({"error": "Invalid request: expected a JSON object"})
+            continue
+        if request.get("cmd") == "stats":
+            emit({"stats": scheduler.stats()})
+            continue
+        # A malformed line gets an error reply; it must not end the serve loop
+        if not isinstance(request.get("path"), str):
+            emit({"error": "Invalid request: missing \"path\"", "job_id": request.get("id")})
+            continue
+        try:
+            deadline = float(request.get("deadline", DEFAULT_DEADLINE_SECONDS))
+        except (TypeError, ValueError):
+            emit({"error": "Invalid request: \"deadline\" must be a number", "job_id": request.get("id")})
+            continue
+
+        future = scheduler.submit(request["path"], deadline, request.get("id"))
+        future.add_done_callback(lambda f: emit(f.result()))
+
+    scheduler.shutdown()
+    emit({"stats": scheduler.stats()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Priority/deadline scheduler for voice note transcription")
+    parser.add_argument("--model", default="small", help="Preferred Whisper model")
+    parser.add_argument("--fallback-model", default="tiny", help="Model used when a deadline is at risk")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TRANSCRIBE_WORKERS", 1)))
+    parser.add_argument("--aging-rate", type=float, default=0.5,
+                        help="Seconds of estimated cost forgiven per second of waiting")
+    parser.add_argument("--autotune", action="store_true", default=os.environ.get("TRANSCRIBE_AUTOTUNE") == "1",
+                        help="Tune torch threads for the number of jobs running concurrently")
+    args = parser.parse_args()
+
+    serve(TranscriptionScheduler(model_size=args.model, fallback_model=args.fallback_model,
+                                 workers=args.workers, aging_rate=args.aging_rate, autotune=args.autotune))